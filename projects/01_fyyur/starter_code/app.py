@@ -2,54 +2,289 @@
 # Imports
 # ----------------------------------------------------------------------------#
 
+import hashlib
 import json
+import re
+import time
 import dateutil.parser
 import babel
+import babel.dates
+from datetime import timedelta, timezone
+from functools import lru_cache
 from flask import (
     Flask,
+	Blueprint,
+	current_app,
     render_template,
     request,
     flash,
     redirect,
     url_for,
 	abort,
-	jsonify
+	jsonify,
+	g,
+	has_app_context,
+	Response,
+	stream_with_context
 )
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-import logging
-from logging import Formatter, FileHandler
-from sqlalchemy import func
+from itertools import groupby
+from collections import Counter, OrderedDict
+import click
+from functools import wraps
+from sqlalchemy import func, and_, or_, case, literal_column, tuple_, bindparam, text, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import selectinload, load_only
+from sqlalchemy.exc import IntegrityError
 from flask_wtf import Form
 from forms import *
 from flask_migrate import Migrate
-from config import SQLALCHEMY_DATABASE_URI
+from search import NgramIndex, PrefixIndex, normalize
+from geo import geohash, geohash_cells, cell_ranges, covered_km, distance_km, geocode
+from cache import PageCache, conditional
+from routing import RoutingSQLAlchemy
+from logs import init_logging
+from intervals import IntervalTree
+import importer
 
 # ----------------------------------------------------------------------------#
 # App Config.
 # ----------------------------------------------------------------------------#
 
 
-app = Flask(__name__)
-app.config.from_object('config')
-moment = Moment(app)
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+# Extensions are bound to an app in create_app(). Nothing here touches the
+# database: SQLAlchemy connects on first use, and the schema is managed by
+# Flask-Migrate ("flask db upgrade"), not created at import.
+moment = Moment()
+db = RoutingSQLAlchemy()
+migrate = Migrate()
+page_cache = PageCache()
+bp = Blueprint('main', __name__, cli_group=None)
 
 # TODO: connect to a local postgresql database
 
 
+def create_app(config=None):
+	app = Flask(__name__)
+	app.config.from_object('config')
+	if config:
+		app.config.update(config)
+	moment.init_app(app)
+	db.init_app(app)
+	migrate.init_app(app, db)
+	page_cache.init_app(app)
+	app.jinja_env.filters['datetime'] = format_datetime
+	app.register_blueprint(bp)
+	if not event.contains(Engine, 'before_cursor_execute', count_query):
+		event.listen(Engine, 'before_cursor_execute', count_query)
+
+	if not app.debug:
+		init_logging(app)
+		app.logger.info('errors')
+	return app
+
+
 
 # ----------------------------------------------------------------------------#
 # Models.
 # ----------------------------------------------------------------------------#
+# Detail pages and counts filter shows by (Venue_id, start_time) or
+# (Artist_id, start_time); the /shows listing pages through (start_time, id).
+# On PostgreSQL, exclusion constraints (see the add_show_end_time migration)
+# reject overlapping [start_time, end_time) bookings of a venue or artist.
 Show = db.Table('Show',
+				db.Column('id', db.Integer, primary_key=True),
 				db.Column('Venue_id', db.Integer, db.ForeignKey('Venue.id')),
 				db.Column('Artist_id', db.Integer, db.ForeignKey('Artist.id')),
-				db.Column('start_time', db.DateTime)
+				db.Column('start_time', db.DateTime),
+				db.Column('end_time', db.DateTime, nullable=False),
+				db.Column('updated_at', db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow),
+				db.Index('ix_Show_Venue_id_start_time', 'Venue_id', 'start_time'),
+				db.Index('ix_Show_Artist_id_start_time', 'Artist_id', 'start_time'),
+				db.Index('ix_Show_start_time_id', 'start_time', 'id')
 				)
 
-class Venue(db.Model):
+# Genres are normalized into one row per name. The association primary keys
+# lead with Genre_id, so "everything with genre X" is an index range scan.
+Venue_genre = db.Table('Venue_genre',
+					   db.Column('Genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+					   db.Column('Venue_id', db.Integer, db.ForeignKey('Venue.id'), primary_key=True, index=True)
+					   )
+
+Artist_genre = db.Table('Artist_genre',
+						db.Column('Genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+						db.Column('Artist_id', db.Integer, db.ForeignKey('Artist.id'), primary_key=True, index=True)
+						)
+
+
+class Genre(db.Model):
+	__tablename__ = 'Genre'
+
+	id = db.Column(db.Integer, primary_key=True)
+	name = db.Column(db.String(120), nullable=False, unique=True)
+
+	@classmethod
+	def from_names(cls, names):
+		# Existing genres are fetched in one query; unknown names are added.
+		names = set(name.strip() for name in names if name and name.strip())
+		genres = cls.query.filter(cls.name.in_(names)).all() if names else []
+		known = set(genre.name for genre in genres)
+		for name in sorted(names - known):
+			genre = cls(name=name)
+			db.session.add(genre)
+			genres.append(genre)
+		return sorted(genres, key=lambda genre: genre.name)
+
+	@classmethod
+	def matching(cls, name):
+		return func.lower(cls.name) == name.strip().lower()
+
+
+def split_shows(shows, now):
+	# Detail pages load all of an entity's shows in one query and split them
+	# here, so past/upcoming lists and counts share the same timestamp.
+	past_shows = [show for show in shows if show.start_time <= now]
+	upcoming_shows = [show for show in shows if show.start_time > now]
+	return {'past_shows': past_shows,
+			'upcoming_shows': upcoming_shows,
+			'past_shows_count': len(past_shows),
+			'upcoming_shows_count': len(upcoming_shows)
+			}
+
+
+ngram_indexes = {}
+prefix_indexes = {}
+
+
+class SearchMixin(object):
+	# Case-insensitive search on name or "city, state", optionally narrowed
+	# by city, state and genre (each matched whole, ignoring case). Returns
+	# (total count, one page of results); both backends agree on both.
+
+	def genre_names(self):
+		return [genre.name for genre in self.genres]
+
+	@classmethod
+	def with_genre(cls, genre):
+		return cls.genres.any(Genre.matching(genre))
+
+	@classmethod
+	def live(cls):
+		# Soft-deleted records stay in the table until purge_deleted.
+		return cls.deleted_at.is_(None)
+
+	@classmethod
+	def exists(cls, item_id):
+		return db.session.query(cls.id).filter(cls.id == item_id, cls.live()).first() is not None
+
+	@classmethod
+	def search(cls, term='', city=None, state=None, genre=None, page=1, per_page=10):
+		if db.engine.dialect.name == 'postgresql':
+			return cls.search_trigram(term, city, state, genre, page, per_page)
+		return cls.search_ngram_index(term, city, state, genre, page, per_page)
+
+	@classmethod
+	def search_trigram(cls, term, city, state, genre, page, per_page):
+		# Served by the pg_trgm GIN indexes; the location expression must
+		# match the indexed one, hence the literal separator.
+		location = cls.city.concat(literal_column("', '")).concat(cls.state)
+		query = db.session.query(cls, func.count().over().label('total')).filter(cls.live())
+		if term:
+			# A substring match, like the fallback's: % and _ are literal.
+			pattern = '%{}%'.format(re.sub(r'([!%_])', r'!\1', term))
+			query = (query
+				.filter(or_(cls.name.ilike(pattern, escape='!'), location.ilike(pattern, escape='!')))
+				.order_by(func.greatest(
+					func.similarity(cls.name, term),
+					func.similarity(location, term)).desc(), cls.name))
+		else:
+			query = query.order_by(cls.name)
+		if city:
+			query = query.filter(func.lower(cls.city) == normalize(city))
+		if state:
+			query = query.filter(func.lower(cls.state) == normalize(state))
+		if genre:
+			query = query.filter(cls.with_genre(genre))
+
+		rows = query.options(selectinload(cls.genres)).limit(per_page).offset((page - 1) * per_page).all()
+		if rows:
+			return rows[0].total, [row[0] for row in rows]
+		# Past the last page the window count has no row to ride on.
+		total = query.with_entities(func.count(cls.id)).order_by(None).scalar() if page > 1 else 0
+		return total, []
+
+	@classmethod
+	def search_ngram_index(cls, term, city, state, genre, page, per_page):
+		index = cls.ngram_index()
+		city, state, genre = (normalize(value) for value in (city, state, genre))
+
+		def where(document):
+			return ((not city or document['city'] == city) and
+					(not state or document['state'] == state) and
+					(not genre or genre in document['genres'].split(',')))
+
+		ranked = index.search(term, where)
+		page_ids = [doc_id for score, doc_id in ranked[(page - 1) * per_page:page * per_page]]
+		found = dict((item.id, item) for item in
+					 cls.query.options(selectinload(cls.genres)).filter(cls.id.in_(page_ids), cls.live()))
+		return len(ranked), [found[doc_id] for doc_id in page_ids if doc_id in found]
+
+	@classmethod
+	def search_document(cls, item):
+		return {'name': item.name,
+				'location': '{}, {}'.format(item.city, item.state),
+				'city': item.city,
+				'state': item.state,
+				'genres': ','.join(item.genre_names())}
+
+	@classmethod
+	def ngram_index(cls):
+		index = ngram_indexes.get(cls.__tablename__)
+		if index is None:
+			index = NgramIndex(fields=('name', 'location'))
+			for item in cls.query.options(selectinload(cls.genres)).filter(cls.live()):
+				index.add(item.id, cls.search_document(item))
+			ngram_indexes[cls.__tablename__] = index
+		return index
+
+	@classmethod
+	def prefix_index(cls):
+		# Names for /autocomplete. Writes handled by this worker update it in
+		# place; other workers' writes arrive with the periodic rebuild.
+		entry = prefix_indexes.get(cls.__tablename__)
+		if entry is None or time.time() - entry[0] > current_app.config['AUTOCOMPLETE_REFRESH_SECONDS']:
+			entry = (time.time(), PrefixIndex(db.session.query(cls.id, cls.name).filter(cls.live())))
+			prefix_indexes[cls.__tablename__] = entry
+		return entry[1]
+
+	@classmethod
+	def with_genres(cls, item_id):
+		return cls.query.options(selectinload(cls.genres)).filter(cls.id == item_id, cls.live()).first()
+
+	@classmethod
+	def reindex(cls, item):
+		# After a create or edit: updates whichever indexes are built.
+		if cls.__tablename__ in ngram_indexes:
+			item = cls.with_genres(item.id)
+			ngram_indexes[cls.__tablename__].add(item.id, cls.search_document(item))
+		if cls.__tablename__ in prefix_indexes:
+			prefix_indexes[cls.__tablename__][1].add(item.id, item.name)
+
+	@classmethod
+	def unindex(cls, item_id):
+		if cls.__tablename__ in ngram_indexes:
+			ngram_indexes[cls.__tablename__].remove(item_id)
+		if cls.__tablename__ in prefix_indexes:
+			prefix_indexes[cls.__tablename__][1].remove(item_id)
+
+	@classmethod
+	def invalidate_search_index(cls):
+		# After bulk changes: both indexes are rebuilt on next use.
+		ngram_indexes.pop(cls.__tablename__, None)
+		prefix_indexes.pop(cls.__tablename__, None)
+
+
+class Venue(SearchMixin, db.Model):
 	__tablename__ = 'Venue'
 
 	id = db.Column(db.Integer, primary_key=True)
@@ -62,17 +297,34 @@ class Venue(db.Model):
 	facebook_link = db.Column(db.String(120))
 
 	# TODO: implement any missing fields, as a database migration using Flask-Migrate
-	genres = db.Column(db.String(120))
+	genres = db.relationship('Genre', secondary=Venue_genre, order_by='Genre.name', lazy='raise')
 	website = db.Column(db.String(120))
 	seeking_talent = db.Column(db.Boolean)
 	seeking_description = db.Column(db.String(500))
-	venues = db.relationship('Artist', secondary=Show, backref=db.backref('shows', lazy='joined'))
-
+	upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+	past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+	updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+	deleted_at = db.Column(db.DateTime, index=True)
+	latitude = db.Column(db.Float)
+	longitude = db.Column(db.Float)
+	# Nearby venues share geohash prefixes, so /venues/near reads a few
+	# ranges of this index instead of scanning every venue.
+	geohash = db.Column(db.String(12), index=True)
+	# Every view picks its own loading strategy (see query_budget); touching
+	# a relationship that wasn't loaded explicitly raises instead of
+	# quietly issuing a query per row.
+	artists = db.relationship('Artist', secondary=Show, viewonly=True, lazy='raise',
+							  backref=db.backref('venues', viewonly=True, lazy='raise'))
+
+
+	def locate(self):
+		for key, value in venue_location(self.city, self.state).items():
+			setattr(self, key, value)
 
 	def venue_info(self):
 		return {'id': self.id,
 				'name': self.name,
-				'genres': self.genres.split(','),
+				'genres': self.genre_names(),
 				'city': self.city,
 				'state': self.state,
 				'phone': self.phone,
@@ -84,67 +336,50 @@ class Venue(db.Model):
 				'seeking_description': self.seeking_description
 				}
 
-	def venue_info_with_upcoming_shows_count(self):
-		return {'id': self.id,
-				'name': self.name,
-				'city': self.city,
-				'state': self.state,
-				'phone': self.phone,
-				'address': self.address,
-				'image_link': self.image_link,
-				'facebook_link': self.facebook_link,
-				'website': self.website,
-				'seeking_talent': self.seeking_talent,
-				'seeking_description': self.seeking_description,
-				'num_shows': db.session.query(func.count(Show.c.Venue_id)).filter(Show.c.Venue_id == self.id).
-					filter(Show.c.start_time > datetime.now()).all()[0][0]
-				}
-
-	def venue_info_with_shows_details(self):
-		return {'id': self.id,
-				'name': self.name,
-				'genres': self.genres.split(','),
-				'address': self.address,
-				'city': self.city,
-				'state': self.state,
-				'phone': self.phone,
-				'website': self.website,
-				'facebook_link': self.facebook_link,
-				'seeking_talent': self.seeking_talent,
-				'seeking_description': self.seeking_description,
-				'image_link': self.image_link,
-				'past_shows':db.session.query(
-					Artist.id.label("artist_id"),
-					Artist.name.label("artist_name"),
-					Artist.image_link.label("artist_image_link"),
-					Show)
-					.join(Artist,Show.c.Artist_id == Artist.id)
-					.filter(Show.c.Venue_id == self.id)
-					.filter(Show.c.start_time <= datetime.now()).all(),
-				'upcoming_shows': db.session.query(
-					Artist.id.label("artist_id"),
-					Artist.name.label("artist_name"),
-					Artist.image_link.label("artist_image_link"),
-					Show)
-					.join(Artist,Show.c.Artist_id == Artist.id)
-					.filter(Show.c.Venue_id == self.id)
-					.filter(Show.c.start_time > datetime.now())
-					.all(),
-				'past_shows_count': (db.session.query(
-					func.count(Show.c.Venue_id))
-					.filter(Show.c.Venue_id == self.id)
-					.filter(Show.c.start_time <= datetime.now())
-					.all())[0][0],
-				'upcoming_shows_count': (db.session.query(
-					func.count(Show.c.Venue_id))
-					.filter(Show.c.Venue_id == self.id)
-					.filter(Show.c.start_time > datetime.now())
-					.all())[0][0]
-				}
-
-
-
-class Artist(db.Model):
+	@classmethod
+	def venue_directory(cls, genre=None):
+		# One query, ordered so the (city, state) areas can be grouped in a
+		# single pass; upcoming show counts come from the maintained counters.
+		query = (db.session.query(
+			cls.id,
+			cls.name,
+			cls.city,
+			cls.state,
+			cls.upcoming_shows_count.label('num_shows'))
+			.filter(cls.live())
+			.order_by(cls.state, cls.city, cls.name))
+		if genre:
+			query = query.filter(cls.with_genre(genre))
+		rows = query.all()
+
+		areas = []
+		for (city, state), venues in groupby(rows, key=lambda row: (row.city, row.state)):
+			areas.append({'city': city,
+						  'state': state,
+						  'venues': [{'id': v.id,
+									  'name': v.name,
+									  'num_shows': v.num_shows} for v in venues]
+						  })
+		return areas
+
+	def venue_info_with_shows_details(self, now=None):
+		now = now or datetime.now()
+		shows = (db.session.query(
+			Artist.id.label("artist_id"),
+			Artist.name.label("artist_name"),
+			Artist.image_link.label("artist_image_link"),
+			Show.c.start_time)
+			.join(Artist, Show.c.Artist_id == Artist.id)
+			.filter(Show.c.Venue_id == self.id, Artist.live())
+			.order_by(Show.c.start_time)
+			.all())
+		info = self.venue_info()
+		info.update(split_shows(shows, now))
+		return info
+
+
+
+class Artist(SearchMixin, db.Model):
 	__tablename__ = 'Artist'
 
 	id = db.Column(db.Integer, primary_key=True)
@@ -152,7 +387,7 @@ class Artist(db.Model):
 	city = db.Column(db.String(120))
 	state = db.Column(db.String(120))
 	phone = db.Column(db.String(120))
-	genres = db.Column(db.String(120))
+	genres = db.relationship('Genre', secondary=Artist_genre, order_by='Genre.name', lazy='raise')
 	image_link = db.Column(db.String(500))
 	facebook_link = db.Column(db.String(120))
 
@@ -160,50 +395,27 @@ class Artist(db.Model):
 	website = db.Column(db.String(120))
 	seeking_venue = db.Column(db.Boolean)
 	seeking_description = db.Column(db.String(500))
+	upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+	past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+	updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+	deleted_at = db.Column(db.DateTime, index=True)
 
 
 
-	def artist_info_with_shows_details(self):
-		return {'id': self.id,
-				'name': self.name,
-				'city': self.city,
-				'state': self.state,
-				'phone': self.phone,
-				'genres': self.genres,
-				'image_link': self.image_link,
-				'facebook_link': self.facebook_link,
-				'seeking_venue': self.seeking_venue,
-				'seeking_description': self.seeking_description,
-				'website': self.website,
-				'upcoming_shows': db.session.query(
-					Venue.id.label("venue_id"),
-					Venue.name.label("venue_name"),
-					Venue.image_link.label("venue_image_link"),
-					Show)
-					.join(Venue, Show.c.Venue_id == Venue.id)
-					.filter(Show.c.Artist_id == self.id)
-					.filter(Show.c.start_time > datetime.now())
-					.all(),
-				'past_shows': db.session.query(
-					Venue.id.label("venue_id"),
-					Venue.name.label("venue_name"),
-					Venue.image_link.label("venue_image_link"),
-					Show)
-					.join(Venue, Show.c.Venue_id == Venue.id)
-					.filter(Show.c.Artist_id == self.id)
-					.filter(Show.c.start_time <= datetime.now())
-					.all(),
-				'upcoming_shows_count': (db.session.query(
-					func.count(Show.c.Artist_id))
-					.filter(Show.c.Artist_id == self.id)
-					.filter(Show.c.start_time > datetime.now())
-					.all())[0][0],
-				'past_shows_count': (db.session.query(
-					func.count(Show.c.Artist_id))
-					.filter(Show.c.Artist_id == self.id)
-					.filter(Show.c.start_time <= datetime.now())
-					.all())[0][0]
-				}
+	def artist_info_with_shows_details(self, now=None):
+		now = now or datetime.now()
+		shows = (db.session.query(
+			Venue.id.label("venue_id"),
+			Venue.name.label("venue_name"),
+			Venue.image_link.label("venue_image_link"),
+			Show.c.start_time)
+			.join(Venue, Show.c.Venue_id == Venue.id)
+			.filter(Show.c.Artist_id == self.id, Venue.live())
+			.order_by(Show.c.start_time)
+			.all())
+		info = self.artist_info()
+		info.update(split_shows(shows, now))
+		return info
 
 
 	def artist_info(self):
@@ -212,7 +424,7 @@ class Artist(db.Model):
 				'city': self.city,
 				'state': self.state,
 				'phone': self.phone,
-				'genres': self.genres,
+				'genres': self.genre_names(),
 				'image_link': self.image_link,
 				'facebook_link': self.facebook_link,
 				'website': self.website,
@@ -226,29 +438,642 @@ class Artist(db.Model):
 # TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
 
 
-db.create_all()
+def shows_listing(start=None, end=None, upcoming=False, now=None):
+	query = (db.session.query(
+		Show.c.id,
+		Venue.id.label("venue_id"),
+		Venue.name.label("venue_name"),
+		Artist.id.label("artist_id"),
+		Artist.name.label("artist_name"),
+		Artist.image_link.label("artist_image_link"),
+		Show.c.start_time)
+		.join(Venue, Show.c.Venue_id == Venue.id)
+		.join(Artist, Show.c.Artist_id == Artist.id)
+		.filter(Venue.live(), Artist.live()))
+	if upcoming:
+		query = query.filter(Show.c.start_time > (now or datetime.now()))
+	if start:
+		query = query.filter(Show.c.start_time >= start)
+	if end:
+		query = query.filter(Show.c.start_time < end)
+	return query.order_by(Show.c.start_time, Show.c.id)
+
+
+def shows_after(query, cursor, limit):
+	# Keyset pagination: seek past the (start_time, id) of the last row seen
+	# instead of counting an OFFSET, so every page is an index range scan.
+	if cursor:
+		query = query.filter(tuple_(Show.c.start_time, Show.c.id) > tuple_(*cursor))
+	return query.limit(limit).all()
+
+
+def iter_shows(query, batch_size):
+	# Walks the whole listing one keyset page at a time, holding a single
+	# batch in memory.
+	cursor = None
+	while True:
+		batch = shows_after(query, cursor, batch_size)
+		for show in batch:
+			yield show
+		if len(batch) < batch_size:
+			return
+		cursor = (batch[-1].start_time, batch[-1].id)
+
+
+def encode_cursor(show):
+	return '{}_{}'.format(show.start_time.isoformat(), show.id)
+
+
+def decode_cursor(value):
+	start_time, show_id = value.rsplit('_', 1)
+	return dateutil.parser.parse(start_time), int(show_id)
+
+
+class CounterState(db.Model):
+	# Venue/Artist show counters split shows at rolled_at rather than at the
+	# current time: shows after it are counted as upcoming. Rolling the
+	# counters moves whatever started since then over to past.
+	__tablename__ = 'Counter_state'
+
+	id = db.Column(db.Integer, primary_key=True)
+	rolled_at = db.Column(db.DateTime, nullable=False)
+
+	@classmethod
+	def current(cls, lock=False, share=False):
+		query = cls.query
+		if lock or share:
+			query = query.with_for_update(read=share)
+		state = query.get(1)
+		if state is None:
+			state = cls(id=1, rolled_at=datetime.now())
+			db.session.add(state)
+			db.session.flush()
+		return state
+
+
+def show_counters():
+	return ((Venue, Show.c.Venue_id), (Artist, Show.c.Artist_id))
+
+
+def show_sides(model):
+	# (model's key in Show, the model on the other side, its key in Show)
+	if model is Venue:
+		return Show.c.Venue_id, Artist, Show.c.Artist_id
+	return Show.c.Artist_id, Venue, Show.c.Venue_id
+
+
+def live_shows():
+	# Shows of soft-deleted venues or artists were uncounted when those
+	# were deleted, so the counters leave them alone until they're purged.
+	return and_(Show.c.Venue_id.notin_(db.session.query(Venue.id).filter(Venue.deleted_at.isnot(None))),
+				Show.c.Artist_id.notin_(db.session.query(Artist.id).filter(Artist.deleted_at.isnot(None))))
+
+
+def shows_count(key, model, *conditions):
+	return (db.session.query(func.count(Show.c.id))
+			.filter(key == model.id, *conditions)
+			.as_scalar())
+
+
+def count_shows(shows):
+	# Adds (venue_id, artist_id, start_time) shows to the counters with one
+	# UPDATE per counted row. Holds the counter state shared, so a concurrent
+	# roll cannot move a show's time slot out from under the increment.
+	state = CounterState.current(share=True)
+	for position, (model, key) in enumerate(show_counters()):
+		increments = Counter()
+		for show in shows:
+			column = 'upcoming_shows_count' if show[2] > state.rolled_at else 'past_shows_count'
+			increments[(int(show[position]), column)] += 1
+		for column in ('upcoming_shows_count', 'past_shows_count'):
+			rows = [{'entity_id': entity_id, 'shows': n}
+					for (entity_id, counted), n in increments.items() if counted == column]
+			if rows:
+				counter = model.__table__.c[column]
+				db.session.execute(
+					model.__table__.update()
+					.where(model.__table__.c.id == bindparam('entity_id'))
+					.values({counter: counter + bindparam('shows')}), rows)
+
+
+def count_show(venue_id, artist_id, start_time):
+	count_shows([(venue_id, artist_id, start_time)])
+
+
+def uncount_shows(model, ids):
+	# Deleted venues' (or artists') own counters go with them; the artists
+	# (or venues) they had shows with lose those shows, in one UPDATE.
+	if not ids:
+		return
+	state = CounterState.current(share=True)
+	key, other, other_key = show_sides(model)
+	theirs = key.in_(ids)
+	(db.session.query(other)
+		.filter(other.id.in_(db.session.query(other_key).filter(theirs)))
+		.update({
+			other.upcoming_shows_count: other.upcoming_shows_count - shows_count(
+				other_key, other, theirs, Show.c.start_time > state.rolled_at),
+			other.past_shows_count: other.past_shows_count - shows_count(
+				other_key, other, theirs, Show.c.start_time <= state.rolled_at)
+		}, synchronize_session=False))
+
+
+def roll_show_counters(now=None):
+	# Moves shows that started since the last roll from upcoming to past,
+	# touching only the venues and artists that had one.
+	now = now or datetime.now()
+	state = CounterState.current(lock=True)
+	started = and_(Show.c.start_time > state.rolled_at, Show.c.start_time <= now, live_shows())
+	tags = set(['venues'])
+	for venue_id, artist_id in db.session.query(Show.c.Venue_id, Show.c.Artist_id).filter(started).distinct():
+		tags.update(['venue:{}'.format(venue_id), 'artist:{}'.format(artist_id)])
+	for model, key in show_counters():
+		moved = shows_count(key, model, started)
+		(db.session.query(model)
+			.filter(model.id.in_(db.session.query(key).filter(started)))
+			.update({
+				model.upcoming_shows_count: model.upcoming_shows_count - moved,
+				model.past_shows_count: model.past_shows_count + moved
+			}, synchronize_session=False))
+	state.rolled_at = now
+	db.session.commit()
+	page_cache.invalidate(*tags)
+
+
+def recount_shows(now=None):
+	# Rebuilds every counter from the Show table.
+	now = now or datetime.now()
+	state = CounterState.current(lock=True)
+	for model, key in show_counters():
+		(db.session.query(model)
+			.update({
+				model.upcoming_shows_count: shows_count(key, model, live_shows(), Show.c.start_time > now),
+				model.past_shows_count: shows_count(key, model, live_shows(), Show.c.start_time <= now)
+			}, synchronize_session=False))
+	state.rolled_at = now
+	db.session.commit()
+	page_cache.invalidate('venues')
+
+
+def overlapping_shows(start, end):
+	if db.engine.dialect.name == 'postgresql':
+		# Served by the GiST indexes behind the exclusion constraints.
+		return func.tsrange(Show.c.start_time, Show.c.end_time).op('&&')(func.tsrange(start, end))
+	# Elsewhere, bound start_time on both sides so the (X_id, start_time)
+	# indexes give a range scan.
+	return and_(Show.c.start_time < end,
+				Show.c.start_time > start - timedelta(minutes=MAX_SHOW_MINUTES),
+				Show.c.end_time > start)
+
+
+def show_conflicts(shows):
+	'''
+	Checks (venue_id, artist_id, start_time, end_time) shows against the
+	booked schedule and against each other, in one query. Returns
+	(position, message) pairs for the shows that would double book a venue
+	or artist; the earlier of two overlapping new shows is kept.
+	'''
+	if not shows:
+		return []
+	venue_ids = set(show[0] for show in shows)
+	artist_ids = set(show[1] for show in shows)
+	booked = db.session.query(Show.c.Venue_id, Show.c.Artist_id, Show.c.start_time, Show.c.end_time).filter(
+		or_(Show.c.Venue_id.in_(venue_ids), Show.c.Artist_id.in_(artist_ids)),
+		overlapping_shows(min(show[2] for show in shows), max(show[3] for show in shows))).all()
+
+	schedules = {}
+	for venue_id, artist_id, start_time, end_time in booked:
+		schedules.setdefault(('venue', venue_id), []).append((start_time, end_time, start_time))
+		schedules.setdefault(('artist', artist_id), []).append((start_time, end_time, start_time))
+	trees = dict((key, IntervalTree(intervals)) for key, intervals in schedules.items())
+
+	# New shows are swept in start order; per venue/artist, accepted holds
+	# the (end, start) of accepted new shows that have not ended yet.
+	conflicts = []
+	accepted = {}
+	for position in sorted(range(len(shows)), key=lambda position: shows[position][2]):
+		venue_id, artist_id, start_time, end_time = shows[position]
+		message = None
+		for key in (('venue', venue_id), ('artist', artist_id)):
+			running = accepted.setdefault(key, [])
+			running[:] = [show for show in running if show[0] > start_time]
+			clashes = sorted(trees[key].overlapping(start_time, end_time)) if key in trees else []
+			clashes += sorted(show[1] for show in running)
+			if clashes:
+				message = '{} {} is already booked for a show starting {}'.format(
+					key[0], key[1], format_datetime(clashes[0], 'full'))
+				break
+		if message:
+			conflicts.append((position, message))
+			continue
+		for key in (('venue', venue_id), ('artist', artist_id)):
+			accepted[key].append((end_time, start_time))
+	return sorted(conflicts)
+
+
+def show_days(start_time, end_time):
+	# The calendar days a [start_time, end_time) show occupies.
+	day = start_time.date()
+	last = (end_time - timedelta(microseconds=1)).date()
+	while day <= last:
+		yield day
+		day += timedelta(days=1)
+
+
+def availability_tags(shows):
+	return list(set('availability:{}'.format(day.isoformat()) for show in shows
+					for day in show_days(show[2], show[3])))
+
+
+def venue_bookings(days, city=None, state=None):
+	'''
+	Returns {day: [(venue_id, name, [(start_time, end_time), ...])]} for the
+	venues matching city/state (case-insensitive) and each of the given
+	days, with one query over the range the days span. Free venues have
+	an empty slot list.
+	'''
+	start = datetime.combine(min(days), datetime.min.time())
+	end = datetime.combine(max(days) + timedelta(days=1), datetime.min.time())
+	query = db.session.query(Venue.id, Venue.name, Show.c.start_time, Show.c.end_time).outerjoin(
+		Show, and_(Show.c.Venue_id == Venue.id, overlapping_shows(start, end))).filter(Venue.live())
+	if city:
+		query = query.filter(func.lower(Venue.city) == city.strip().lower())
+	if state:
+		query = query.filter(func.lower(Venue.state) == state.strip().lower())
+	bookings = dict((day, []) for day in days)
+	for (venue_id, name), rows in groupby(query.order_by(Venue.id, Show.c.start_time), lambda row: row[:2]):
+		slots = dict((day, []) for day in days)
+		for row in rows:
+			if row.start_time is not None:
+				for day in show_days(row.start_time, row.end_time):
+					if day in slots:
+						slots[day].append((row.start_time, row.end_time))
+		for day in days:
+			bookings[day].append((venue_id, name, slots[day]))
+	return bookings
+
+
+def venue_availability(start, end, city=None, state=None):
+	# Each (area, day) is cached on its own, so overlapping ranges share
+	# entries and a new booking only invalidates the days it covers.
+	days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+	area = '{}|{}'.format((city or '').strip().lower(), (state or '').strip().lower())
+	keys = dict((day, page_cache.tagged_key('availability:{}:{}'.format(area, day.isoformat()),
+											['availability', 'availability:{}'.format(day.isoformat())]))
+				for day in days)
+	bookings = {}
+	for day in days:
+		bookings[day] = page_cache.backend.get(keys[day])
+	missing = [day for day in days if bookings[day] is None]
+	if missing:
+		for day, entry in venue_bookings(missing, city, state).items():
+			page_cache.backend.set(keys[day], entry)
+			bookings[day] = entry
+	return bookings
+
+
+def venue_pages(venue_id):
+	# The venue's name and image also appear on the pages of artists it hosts.
+	artists = db.session.query(Show.c.Artist_id).filter(Show.c.Venue_id == venue_id).distinct()
+	return ['venues', 'availability', 'venue:{}'.format(venue_id)] + ['artist:{}'.format(a) for (a,) in artists]
+
+
+def artist_pages(artist_id):
+	venues = db.session.query(Show.c.Venue_id).filter(Show.c.Artist_id == artist_id).distinct()
+	return ['artists', 'artist:{}'.format(artist_id)] + ['venue:{}'.format(v) for (v,) in venues]
+
+
+# Geohash precision /venues/near starts from: 5 character cells are a few
+# kilometres across.
+VENUES_NEAR_PRECISION = 5
+
+
+def venue_location(city, state):
+	# Geocoded from the bundled gazetteer; all None for unknown places.
+	point = geocode(city, state, current_app.config['GAZETTEER_FILE'])
+	if point is None:
+		return {'latitude': None, 'longitude': None, 'geohash': None}
+	return {'latitude': point[0], 'longitude': point[1], 'geohash': geohash(*point)}
+
+
+def nearest_venues(lat, lon, radius_km, limit):
+	'''
+	The limit venues nearest to (lat, lon) within radius_km, nearest first,
+	as (distance_km, venue) pairs. Starts from the geohash cells around the
+	point at a fine precision and only widens to coarser cells while fewer
+	than limit venues are known to be nearest, so a dense area costs one or
+	two small index range scans.
+	'''
+	found = []
+	for precision in range(VENUES_NEAR_PRECISION, 0, -1):
+		reach = min(covered_km(lat, precision), radius_km)
+		ranges = [and_(Venue.geohash >= low, Venue.geohash < high) if high else Venue.geohash >= low
+				  for low, high in cell_ranges(geohash_cells(lat, lon, precision))]
+		rows = (db.session.query(Venue.id, Venue.name, Venue.city, Venue.state, Venue.latitude, Venue.longitude)
+				.filter(or_(*ranges), Venue.live()).all())
+		found = sorted(((distance_km(lat, lon, row.latitude, row.longitude), row) for row in rows),
+					   key=lambda pair: pair[0])
+		found = [pair for pair in found if pair[0] <= reach]
+		if len(found) >= limit or reach >= radius_km:
+			break
+	return found[:limit]
+
+
+def page_version(model, item_id, now=None):
+	'''
+	Versions a venue or artist page with one query over what it is rendered
+	from: when the record, its shows and the other side of those shows last
+	changed, how many shows it has, and the latest of them to have started
+	(the page moves a show from upcoming to past right then). Returns
+	(etag, last_modified), or None if there is no such record.
+	'''
+	now = now or datetime.now()
+	key, other, other_key = show_sides(model)
+	row = (db.session.query(
+		model.updated_at,
+		func.max(Show.c.updated_at),
+		func.max(other.updated_at),
+		func.count(Show.c.id),
+		func.max(case((Show.c.start_time <= now, Show.c.start_time))))
+		.select_from(model)
+		.outerjoin(Show, key == model.id)
+		.outerjoin(other, other_key == other.id)
+		.filter(model.id == item_id, model.live())
+		.group_by(model.id)
+		.first())
+	if row is None:
+		return None
+	# updated_at is kept in UTC; show times are local, like datetime.now().
+	stamps = [stamp.replace(tzinfo=timezone.utc) for stamp in row[:3] if stamp]
+	if row[4]:
+		stamps.append(row[4].astimezone(timezone.utc))
+	etag = hashlib.sha1(repr((model.__tablename__, item_id) + tuple(row)).encode()).hexdigest()
+	return etag, max(stamps)
+
+
+def allocate_ids(model, count):
+	# Primary keys for a batch insert, so rows and their genre links can go
+	# in with executemany instead of one INSERT ... RETURNING per row.
+	table = model.__table__
+	if db.engine.dialect.name == 'postgresql':
+		return [row[0] for row in db.session.execute(
+			text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)"),
+			{'table': '"{}"'.format(table.name), 'count': count})]
+	start = (db.session.query(func.max(table.c.id)).scalar() or 0) + 1
+	return list(range(start, start + count))
+
+
+def import_entities(model, genre_table, key, fields, batch):
+	ids = allocate_ids(model, len(batch))
+	genres = Genre.from_names(set(name for line, data in batch for name in data['genres']))
+	db.session.flush()
+	genres = dict((genre.name, genre.id) for genre in genres)
+	db.session.execute(model.__table__.insert(), [
+		dict([('id', entity_id)] + [(field, data[field]) for field in fields])
+		for entity_id, (line, data) in zip(ids, batch)])
+	links = [{key: entity_id, 'Genre_id': genres[name]}
+			 for entity_id, (line, data) in zip(ids, batch) for name in set(data['genres'])]
+	if links:
+		db.session.execute(genre_table.insert(), links)
+
+
+def import_venues(batch):
+	for line, data in batch:
+		data.update(venue_location(data['city'], data['state']))
+	import_entities(Venue, Venue_genre, 'Venue_id',
+					('name', 'city', 'state', 'address', 'phone', 'image_link', 'facebook_link',
+					 'latitude', 'longitude', 'geohash'), batch)
+	return []
+
+
+def import_artists(batch):
+	import_entities(Artist, Artist_genre, 'Artist_id',
+					('name', 'city', 'state', 'phone', 'image_link', 'facebook_link'), batch)
+	return []
+
+
+def import_shows(batch):
+	rejected, shows = [], []
+	for line, data in batch:
+		try:
+			shows.append((line, int(data['venue_id']), int(data['artist_id']), data['start_time'],
+						  data['start_time'] + timedelta(minutes=data['duration'])))
+		except (TypeError, ValueError):
+			rejected.append((line, 'venue_id and artist_id must be numbers'))
+	venue_ids = set(row[0] for row in db.session.query(Venue.id).filter(
+		Venue.id.in_(set(s[1] for s in shows)), Venue.live()))
+	artist_ids = set(row[0] for row in db.session.query(Artist.id).filter(
+		Artist.id.in_(set(s[2] for s in shows)), Artist.live()))
+	checked = []
+	for line, venue_id, artist_id, start_time, end_time in shows:
+		if venue_id not in venue_ids:
+			rejected.append((line, 'no venue with id {}'.format(venue_id)))
+		elif artist_id not in artist_ids:
+			rejected.append((line, 'no artist with id {}'.format(artist_id)))
+		else:
+			checked.append((line, (venue_id, artist_id, start_time, end_time)))
+	conflicts = dict(show_conflicts([show for line, show in checked]))
+	valid = []
+	for position, (line, show) in enumerate(checked):
+		if position in conflicts:
+			rejected.append((line, conflicts[position]))
+		else:
+			valid.append(show)
+	if valid:
+		db.session.execute(Show.insert(), [
+			{'Venue_id': venue_id, 'Artist_id': artist_id, 'start_time': start_time, 'end_time': end_time}
+			for venue_id, artist_id, start_time, end_time in valid])
+		count_shows(valid)
+		page_cache.invalidate(*set(tag for show in valid
+								   for tag in ('venue:{}'.format(show[0]), 'artist:{}'.format(show[1]))))
+		page_cache.invalidate(*availability_tags(valid))
+	return rejected
+
+
+IMPORTS = {
+	'venues': (VenueForm, import_venues, lambda: Venue.invalidate_search_index(), ['venues', 'availability']),
+	'artists': (ArtistForm, import_artists, lambda: Artist.invalidate_search_index(), ['artists']),
+	'shows': (ShowForm, import_shows, lambda: None, ['venues']),
+}
+
+
+def import_file(kind, stream, format, batch_size=1000):
+	# Yields the running totals after each batch (see importer.import_records).
+	form_class, insert, after_import, pages = IMPORTS[kind]
+
+	def insert_batch(batch):
+		# One transaction per batch; a batch the database refuses is
+		# reported as rejected and the import carries on.
+		try:
+			rejected = insert(batch)
+			db.session.commit()
+		except Exception as e:
+			db.session.rollback()
+			current_app.logger.exception('Import batch failed')
+			return [(line, 'batch failed: {}'.format(e.__class__.__name__)) for line, data in batch]
+		return rejected
+
+	try:
+		for totals in importer.import_records(importer.read_records(stream, format), form_class,
+											  insert_batch, batch_size=batch_size):
+			yield totals
+	finally:
+		after_import()
+		page_cache.invalidate(*pages)
+
+
+DELETABLE = {
+	'venues': (Venue, Venue_genre.c.Venue_id),
+	'artists': (Artist, Artist_genre.c.Artist_id),
+}
+
+
+def deleted_pages(model, ids):
+	# The records' own pages, the listings (their counters change) and the
+	# pages of whoever they had shows with.
+	key, other, other_key = show_sides(model)
+	own, counterpart = ('venue', 'artist') if model is Venue else ('artist', 'venue')
+	others = db.session.query(other_key).filter(key.in_(ids)).distinct() if ids else []
+	return (['venues', 'artists', 'availability'] + ['{}:{}'.format(own, item_id) for item_id in ids]
+			+ ['{}:{}'.format(counterpart, other_id) for (other_id,) in others])
+
+
+def delete_records(kind, ids, soft=False):
+	'''
+	Deletes the venues or artists with the given ids in one transaction and
+	returns the affected row counts. A hard delete cascades to their shows
+	and genre links with one statement per table. soft=True only marks the
+	records deleted, which hides them everywhere at once, and leaves the
+	rows to purge_deleted.
+	'''
+	model, genre_key = DELETABLE[kind]
+	key = show_sides(model)[0]
+	ids = sorted(set(ids))
+	live = [row[0] for row in db.session.query(model.id).filter(model.id.in_(ids), model.live())]
+	pages = deleted_pages(model, ids)
+	# Records soft-deleted earlier were uncounted back then.
+	uncount_shows(model, live)
+	if soft:
+		counts = {kind: (db.session.query(model).filter(model.id.in_(live))
+						 .update({model.deleted_at: datetime.utcnow()}, synchronize_session=False))}
+	else:
+		counts = {
+			'shows': db.session.execute(Show.delete().where(key.in_(ids))).rowcount,
+			'genre_links': db.session.execute(genre_key.table.delete().where(genre_key.in_(ids))).rowcount,
+			kind: db.session.execute(model.__table__.delete().where(model.id.in_(ids))).rowcount,
+		}
+	db.session.commit()
+	for item_id in ids:
+		model.unindex(item_id)
+	page_cache.invalidate(*pages)
+	return counts
+
+
+def purge_deleted(kind, batch_size=1000):
+	'''
+	Removes soft-deleted venues or artists with their shows and genre
+	links, at most batch_size rows per statement and one transaction per
+	statement, so a large cleanup never holds its locks for long. Yields
+	the running counts after each transaction.
+	'''
+	model, genre_key = DELETABLE[kind]
+	key = show_sides(model)[0]
+	counts = {kind: 0, 'shows': 0, 'genre_links': 0}
+	try:
+		while True:
+			ids = [row[0] for row in db.session.query(model.id).filter(model.deleted_at.isnot(None))
+				   .order_by(model.id).limit(batch_size)]
+			if not ids:
+				return
+			while True:
+				shows = db.session.query(Show.c.id).filter(key.in_(ids)).limit(batch_size)
+				deleted = db.session.execute(Show.delete().where(Show.c.id.in_(shows))).rowcount
+				db.session.commit()
+				counts['shows'] += deleted
+				yield counts
+				if deleted < batch_size:
+					break
+			counts['genre_links'] += db.session.execute(genre_key.table.delete().where(genre_key.in_(ids))).rowcount
+			counts[kind] += db.session.execute(model.__table__.delete().where(model.id.in_(ids))).rowcount
+			db.session.commit()
+			yield counts
+	finally:
+		# Purged shows free their time slots.
+		if counts['shows']:
+			page_cache.invalidate('availability')
 
 # ----------------------------------------------------------------------------#
 # Filters.
 # ----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-	date = dateutil.parser.parse(str(value))
-	if format == 'full':
-		format = "EEEE MMMM, d, y 'at' h:mma"
-	elif format == 'medium':
-		format = "EE MM, dd, y h:mma"
-	return babel.dates.format_datetime(date, format)
+DATETIME_FORMATS = {
+	'full': "EEEE MMMM, d, y 'at' h:mma",
+	'medium': "EE MM, dd, y h:mma"
+}
+
 
+@lru_cache(maxsize=None)
+def compiled_datetime_format(format, locale):
+	return (babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format)),
+			babel.Locale.parse(locale))
 
-app.jinja_env.filters['datetime'] = format_datetime
+
+@lru_cache(maxsize=2048)
+def format_datetime(value, format='medium', locale=None):
+	# Shows arrive as datetime objects, so parsing is only a fallback, and
+	# the Babel pattern and locale are compiled once per (format, locale).
+	if not isinstance(value, datetime):
+		value = dateutil.parser.parse(str(value))
+	if format in ('long', 'short'):
+		return babel.dates.format_datetime(value, format, locale=locale or babel.dates.LC_TIME)
+	if value.tzinfo is None:
+		# Babel treats naive datetimes as UTC.
+		value = value.replace(tzinfo=babel.dates.UTC)
+	pattern, locale = compiled_datetime_format(format, locale or babel.dates.LC_TIME)
+	return pattern.apply(value, locale)
+
+
+
+# ----------------------------------------------------------------------------#
+# Query budgets.
+# ----------------------------------------------------------------------------#
+
+def count_query(conn, cursor, statement, parameters, context, executemany):
+	if has_app_context() and 'query_count' in g:
+		g.query_count += 1
+
+
+def query_budget(limit):
+	'''
+	Declares how many SQL queries a view may issue when it renders (a page
+	cache hit issues none). With CHECK_QUERY_BUDGETS on, a view that goes
+	over logs a warning, or raises under TESTING.
+	'''
+	def decorator(view):
+		@wraps(view)
+		def wrapper(*args, **kwargs):
+			if not current_app.config.get('CHECK_QUERY_BUDGETS'):
+				return view(*args, **kwargs)
+			g.query_count = 0
+			response = view(*args, **kwargs)
+			if g.query_count > limit:
+				message = '{} issued {} queries, over its budget of {}'.format(
+					request.endpoint, g.query_count, limit)
+				if current_app.testing:
+					raise AssertionError(message)
+				current_app.logger.warning(message)
+			return response
+		wrapper.query_budget = limit
+		return wrapper
+	return decorator
 
 
 # ----------------------------------------------------------------------------#
 # Controllers.
 # ----------------------------------------------------------------------------#
 
-@app.route('/')
+@bp.route('/')
+@query_budget(0)
 def index():
 	return render_template('pages/home.html')
 
@@ -256,46 +1081,106 @@ def index():
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
+@bp.route('/venues')
+@page_cache.cached(lambda: ['venues'])
+@query_budget(1)
 def venues():
 	# TODO: replace with real venues data.
 	#       num_shows should be aggregated based on number of upcoming shows per venue.
-	unique_city_states = Venue.query.distinct(Venue.city, Venue.state).all()
-	data = []
-	for item in unique_city_states:
-		venue= {'city': item.city,
-					'state': item.state,
-					'venues': []}
-		for v in Venue.query.filter(Venue.city == item.city,Venue.state == item.state).all():
-			venue['venues'].append(v.venue_info_with_upcoming_shows_count())
-		data.append(venue)
+	data = Venue.venue_directory(genre=request.args.get('genre'))
 	return render_template('pages/venues.html', areas=data);
 
 
-@app.route('/venues/search', methods=['POST'])
+@bp.route('/venues/availability')
+@query_budget(1)
+def venues_availability():
+	# Free/busy calendar for every venue in ?city=&state= over the days
+	# ?start= to ?end= (inclusive); ?free=1 keeps only venues with no
+	# show at all in the range.
+	try:
+		start = dateutil.parser.parse(request.args['start']).date()
+		end = dateutil.parser.parse(request.args.get('end') or request.args['start']).date()
+	except (KeyError, ValueError, OverflowError):
+		abort(400)
+	if end < start or (end - start).days >= current_app.config['AVAILABILITY_MAX_DAYS']:
+		abort(400)
+	bookings = venue_availability(start, end, request.args.get('city'), request.args.get('state'))
+
+	venues = OrderedDict()
+	for day in sorted(bookings):
+		for venue_id, name, slots in bookings[day]:
+			venue = venues.setdefault(venue_id, {'id': venue_id, 'name': name, 'free': True, 'busy': {}})
+			if slots:
+				venue['free'] = False
+				venue['busy'][day.isoformat()] = [
+					{'start_time': start_time.isoformat(), 'end_time': end_time.isoformat()}
+					for start_time, end_time in slots]
+	data = list(venues.values())
+	if request.args.get('free', type=int) == 1:
+		data = [venue for venue in data if venue['free']]
+	return jsonify({'start': start.isoformat(), 'end': end.isoformat(), 'venues': data})
+
+
+@bp.route('/venues/near')
+# One query per geohash precision tried.
+@query_budget(VENUES_NEAR_PRECISION)
+def venues_near():
+	# The ?limit= venues nearest to ?lat=&lon=, within ?radius= km.
+	try:
+		lat = float(request.args['lat'])
+		lon = float(request.args['lon'])
+		radius = float(request.args.get('radius', current_app.config['VENUES_NEAR_RADIUS_KM']))
+	except (KeyError, ValueError):
+		abort(400)
+	if not (-90 <= lat <= 90 and -180 <= lon <= 180 and 0 < radius <= current_app.config['VENUES_NEAR_MAX_RADIUS_KM']):
+		abort(400)
+	limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+	return jsonify({'venues': [{'id': venue.id,
+								'name': venue.name,
+								'city': venue.city,
+								'state': venue.state,
+								'latitude': venue.latitude,
+								'longitude': venue.longitude,
+								'distance_km': round(distance, 3)}
+							   for distance, venue in nearest_venues(lat, lon, radius, limit)]})
+
+
+@bp.route('/venues/search', methods=['GET', 'POST'])
+# 2, plus 2 when the SQLite fallback index is (re)built.
+@query_budget(4)
 def search_venues():
 	# TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
 	# seach for Hop should return "The Musical Hop".
 	# search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-	search_term = request.form.get('search_term', '')
-	venues = Venue.query.filter(
-		Venue.name.ilike("%{}%".format(search_term))).all()
-	count_venues = len(venues)
+	search_term = request.values.get('search_term', '')
+	page = max(1, request.values.get('page', 1, type=int))
+	count_venues, venues = Venue.search(
+		search_term,
+		city=request.values.get('city'),
+		state=request.values.get('state'),
+		genre=request.values.get('genre'),
+		page=page,
+		per_page=current_app.config['SEARCH_RESULTS_PER_PAGE'])
 
 	response = {
 		"count": count_venues,
-		"data": [v.venue_info() for v in venues]
+		"data": [v.venue_info() for v in venues],
+		"page": page,
+		"has_next": page * current_app.config['SEARCH_RESULTS_PER_PAGE'] < count_venues
 	}
 
 	return render_template('pages/search_venues.html', results=response,
-						   search_term=request.form.get('search_term', ''))
+						   search_term=search_term)
 
 
-@app.route('/venues/<int:venue_id>')
+@bp.route('/venues/<int:venue_id>')
+@conditional(lambda venue_id: page_version(Venue, venue_id))
+@page_cache.cached(lambda venue_id: ['venue:{}'.format(venue_id)])
+@query_budget(3)
 def show_venue(venue_id):
 	# shows the venue page with the given venue_id
 	# TODO: replace with real venue data from the venues table, using venue_id
-	venue = Venue.query.get(venue_id)
+	venue = Venue.with_genres(venue_id)
 	if venue is None:
 		abort(404)
 	else:data = venue.venue_info_with_shows_details()
@@ -305,13 +1190,13 @@ def show_venue(venue_id):
 #  Create Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
+@bp.route('/venues/create', methods=['GET'])
 def create_venue_form():
 	form = VenueForm()
 	return render_template('forms/new_venue.html', form=form)
 
 
-@app.route('/venues/create', methods=['POST'])
+@bp.route('/venues/create', methods=['POST'])
 def create_venue_submission():
 	# TODO: insert form data as a new Venue record in the db, instead
 	# TODO: modify data to be the data object returned from db insertion
@@ -319,7 +1204,7 @@ def create_venue_submission():
 		venue_form = VenueForm(request.form)
 		new_venue = Venue(
 			name=venue_form.name.data,
-			genres=','.join(venue_form.genres.data),
+			genres=Genre.from_names(venue_form.genres.data),
 			address=venue_form.address.data,
 			city=venue_form.city.data,
 			state=venue_form.state.data,
@@ -327,8 +1212,11 @@ def create_venue_submission():
 			facebook_link=venue_form.facebook_link.data,
 			image_link=venue_form.image_link.data
 		)
+		new_venue.locate()
 		db.session.add(new_venue)
 		db.session.commit()
+		Venue.reindex(new_venue)
+		page_cache.invalidate('venues', 'availability')
 		# on successful db insert, flash success
 		flash('Venue ' + request.form['name'] + ' was successfully listed!')
 	# TODO: on unsuccessful db insert, flash an error instead.
@@ -340,13 +1228,13 @@ def create_venue_submission():
 	return render_template('pages/home.html')
 
 
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+@bp.route('/venues/<venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
 	# TODO: Complete this endpoint for taking a venue_id, and using
 	# SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+	deleted = None
 	try:
-		Venue.query.filter_by(id=venue_id).delete()
-		db.session.commit()
+		deleted = delete_records('venues', [int(venue_id)])
 		flash('Venue ' + venue_id + ' was successfully deleted!')
 	except:
 		db.session.rollback()
@@ -355,45 +1243,63 @@ def delete_venue(venue_id):
 		db.session.close()
 	# BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
 	# clicking that button delete it from the db then redirect the user to the homepage
-	return jsonify({ 'success': True })
+	return jsonify({ 'success': deleted is not None, 'deleted': deleted })
 
 
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
+@bp.route('/artists')
+@page_cache.cached(lambda: ['artists'])
+@query_budget(1)
 def artists():
 	# TODO: replace with real data returned from querying the database
 	data=[]
-	artists = Artist.query.all()
+	query = Artist.query.options(load_only(Artist.id, Artist.name)).filter(Artist.live())
+	genre = request.args.get('genre')
+	if genre:
+		query = query.filter(Artist.with_genre(genre))
+	artists = query.all()
 	for item in artists:
 		data.append(item.artist_name())
 	return render_template('pages/artists.html', artists=data)
 
 
-@app.route('/artists/search', methods=['POST'])
+@bp.route('/artists/search', methods=['GET', 'POST'])
+# 2, plus 2 when the SQLite fallback index is (re)built.
+@query_budget(4)
 def search_artists():
 	# TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
 	# seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
 	# search for "band" should return "The Wild Sax Band".
-	search_term = request.form.get('search_term', '')
-	artists = Artist.query.filter(
-		Artist.name.ilike("%{}%".format(search_term))).all()
-	count_artists= len(artists)
+	search_term = request.values.get('search_term', '')
+	page = max(1, request.values.get('page', 1, type=int))
+	count_artists, artists = Artist.search(
+		search_term,
+		city=request.values.get('city'),
+		state=request.values.get('state'),
+		genre=request.values.get('genre'),
+		page=page,
+		per_page=current_app.config['SEARCH_RESULTS_PER_PAGE'])
 
 	response = {
 		"count": count_artists,
-		"data": [a.artist_info() for a in artists]
+		"data": [a.artist_info() for a in artists],
+		"page": page,
+		"has_next": page * current_app.config['SEARCH_RESULTS_PER_PAGE'] < count_artists
 	}
 
 	return render_template('pages/search_artists.html', results=response,
-						   search_term=request.form.get('search_term', ''))
+						   search_term=search_term)
 
 
-@app.route('/artists/<int:artist_id>')
+@bp.route('/artists/<int:artist_id>')
+@conditional(lambda artist_id: page_version(Artist, artist_id))
+@page_cache.cached(lambda artist_id: ['artist:{}'.format(artist_id)])
+@query_budget(3)
 def show_artist(artist_id):
 	# shows the artist page with the given artist_id
 	# TODO: replace with real artist data from the artists table, using artist_id
-	artist = Artist.query.get(artist_id)
+	artist = Artist.with_genres(artist_id)
 	if artist is None:
 		abort(404)
 	else:
@@ -401,12 +1307,27 @@ def show_artist(artist_id):
 	return render_template('pages/show_artist.html', artist=data)
 
 
+@bp.route('/artists/<artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+	deleted = None
+	try:
+		deleted = delete_records('artists', [int(artist_id)])
+		flash('Artist ' + artist_id + ' was successfully deleted!')
+	except:
+		db.session.rollback()
+		flash('An error occurred. Artist ' + artist_id + ' could not be deleted.')
+	finally:
+		db.session.close()
+	return jsonify({ 'success': deleted is not None, 'deleted': deleted })
+
+
 #  Update
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@query_budget(2)
 def edit_artist(artist_id):
 	form = ArtistForm()
-	artist = Artist.query.get(artist_id)
+	artist = Artist.with_genres(artist_id)
 	if artist is None:
 		abort(404)
 	else:
@@ -414,27 +1335,31 @@ def edit_artist(artist_id):
 		form.city.data = artist.city
 		form.state.data = artist.state
 		form.phone.data = artist.phone
-		form.genres.data = artist.genres
+		form.genres.data = artist.genre_names()
 		form.facebook_link.data = artist.facebook_link
 	# TODO: populate form with fields from artist with ID <artist_id>
 	return render_template('forms/edit_artist.html', form=form, artist=artist)
 
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
 	# TODO: take values from the form submitted, and update existing
 	# artist record with ID <artist_id> using the new attributes
 	try:
 		artist_form = ArtistForm(request.form)
-		artist = Artist.query.get(artist_id)
-		artist.name=artist_form.name.data,
-		artist.genres=','.join(artist_form.genres.data),
-		artist.city=artist_form.city.data,
-		artist.state=artist_form.state.data,
-		artist.phone=artist_form.phone.data,
-		artist.facebook_link=artist_form.facebook_link.data,
+		artist = Artist.with_genres(artist_id)
+		artist.name=artist_form.name.data
+		artist.genres = Genre.from_names(artist_form.genres.data)
+		artist.city=artist_form.city.data
+		artist.state=artist_form.state.data
+		artist.phone=artist_form.phone.data
+		artist.facebook_link=artist_form.facebook_link.data
 		artist.image_link=artist_form.image_link.data
+		# Genre changes alone don't update the row.
+		artist.updated_at = datetime.utcnow()
 		db.session.commit()
+		Artist.reindex(artist)
+		page_cache.invalidate(*artist_pages(artist_id))
 
 		# on successful db insert, flash success
 		flash('Artist ' + request.form['name'] + ' was successfully updated!')
@@ -443,13 +1368,14 @@ def edit_artist_submission(artist_id):
 	finally:
 		db.session.close()
 
-	return redirect(url_for('show_artist', artist_id=artist_id))
+	return redirect(url_for('main.show_artist', artist_id=artist_id))
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@query_budget(2)
 def edit_venue(venue_id):
 	form = VenueForm()
-	venue = Venue.query.get(venue_id)
+	venue = Venue.with_genres(venue_id)
 	if venue is None:
 		abort(404)
 	else:
@@ -458,28 +1384,33 @@ def edit_venue(venue_id):
 		form.state.data = venue.state
 		form.address.data = venue.address
 		form.phone.data = venue.phone
-		form.genres.data = venue.genres
+		form.genres.data = venue.genre_names()
 		form.facebook_link.data = venue.facebook_link
 	# TODO: populate form with values from venue with ID <venue_id>
 	return render_template('forms/edit_venue.html', form=form, venue=venue)
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
 	# TODO: take values from the form submitted, and update existing
 	# venue record with ID <venue_id> using the new attributes
 	try:
 		venue_form = VenueForm(request.form)
-		venue = Venue.query.get(venue_id)
-		venue.name=venue_form.name.data,
-		venue.genres=','.join(venue_form.genres.data),
-		venue.address=venue_form.address.data,
-		venue.city=venue_form.city.data,
-		venue.state=venue_form.state.data,
-		venue.phone=venue_form.phone.data,
-		venue.facebook_link=venue_form.facebook_link.data,
+		venue = Venue.with_genres(venue_id)
+		venue.name=venue_form.name.data
+		venue.genres = Genre.from_names(venue_form.genres.data)
+		venue.address=venue_form.address.data
+		venue.city=venue_form.city.data
+		venue.state=venue_form.state.data
+		venue.phone=venue_form.phone.data
+		venue.facebook_link=venue_form.facebook_link.data
 		venue.image_link=venue_form.image_link.data
+		venue.locate()
+		# Genre changes alone don't update the row.
+		venue.updated_at = datetime.utcnow()
 		db.session.commit()
+		Venue.reindex(venue)
+		page_cache.invalidate(*venue_pages(venue_id))
 
 		# on successful db insert, flash success
 		flash('Venue ' + request.form['name'] + ' was successfully updated!')
@@ -488,19 +1419,19 @@ def edit_venue_submission(venue_id):
 	finally:
 		db.session.close()
 
-	return redirect(url_for('show_venue', venue_id=venue_id))
+	return redirect(url_for('main.show_venue', venue_id=venue_id))
 
 
 #  Create Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
+@bp.route('/artists/create', methods=['GET'])
 def create_artist_form():
 	form = ArtistForm()
 	return render_template('forms/new_artist.html', form=form)
 
 
-@app.route('/artists/create', methods=['POST'])
+@bp.route('/artists/create', methods=['POST'])
 def create_artist_submission():
 	# called upon submitting the new artist listing form
 	# TODO: insert form data as a new Venue record in the db, instead
@@ -509,7 +1440,7 @@ def create_artist_submission():
 		artist_form = ArtistForm(request.form)
 		new_artist = Artist(
 			name=artist_form.name.data,
-			genres=','.join(artist_form.genres.data),
+			genres=Genre.from_names(artist_form.genres.data),
 			city=artist_form.city.data,
 			state=artist_form.state.data,
 			phone=artist_form.phone.data,
@@ -518,6 +1449,8 @@ def create_artist_submission():
 		)
 		db.session.add(new_artist)
 		db.session.commit()
+		Artist.reindex(new_artist)
+		page_cache.invalidate('artists')
 		# on successful db insert, flash success
 		flash('Artist ' + request.form['name'] + ' was successfully listed!')
 	# TODO: on unsuccessful db insert, flash an error instead.
@@ -533,47 +1466,121 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+def shows_listing_from_request():
+	try:
+		start = request.args.get('start')
+		end = request.args.get('end')
+		return shows_listing(
+			start=dateutil.parser.parse(start) if start else None,
+			end=dateutil.parser.parse(end) if end else None,
+			upcoming=request.args.get('upcoming', type=int) == 1)
+	except ValueError:
+		abort(400)
+
+
+def stream_template(template_name, **context):
+	current_app.update_template_context(context)
+	template = current_app.jinja_env.get_template(template_name)
+	stream = template.stream(context)
+	stream.enable_buffering(5)
+	return stream
+
+
+@bp.route('/shows')
+# Streamed listings (?stream=1) query after the view returns.
+@query_budget(1)
 def shows():
-	# displays list of shows at /shows
-	# TODO: replace with real venues data.
-	#       num_shows should be aggregated based on number of upcoming shows per venue.
-	data=(db.session.query(
-    Venue.id.label("venue_id"),
-    Venue.name.label("venue_name"),
-    Artist.id.label("artist_id"),
-    Artist.name.label("artist_name"),
-    Artist.image_link.label("artist_image_link"),
-    Show)
-    .filter(Show.c.Venue_id == Venue.id)
-    .filter(Show.c.Artist_id == Artist.id)
-    .all())
-
-	return render_template('pages/shows.html', shows=data)
-
-
-@app.route('/shows/create')
+	# displays list of shows at /shows, one keyset page at a time;
+	# ?stream=1 streams every matching show instead.
+	query = shows_listing_from_request()
+	if request.args.get('stream', type=int) == 1:
+		data = iter_shows(query, current_app.config['SHOWS_STREAM_BATCH_SIZE'])
+		return Response(stream_with_context(stream_template('pages/shows.html', shows=data)))
+
+	after = request.args.get('after')
+	try:
+		cursor = decode_cursor(after) if after else None
+	except ValueError:
+		abort(400)
+	per_page = current_app.config['SHOWS_PER_PAGE']
+	data = shows_after(query, cursor, per_page + 1)
+	next_cursor = encode_cursor(data[per_page - 1]) if len(data) > per_page else None
+
+	return render_template('pages/shows.html', shows=data[:per_page], next_cursor=next_cursor)
+
+
+@bp.route('/shows.json')
+def shows_json():
+	# Streams the matching shows as a JSON array, batch by batch.
+	query = shows_listing_from_request()
+
+	def generate():
+		yield '['
+		for i, show in enumerate(iter_shows(query, current_app.config['SHOWS_STREAM_BATCH_SIZE'])):
+			yield (',' if i else '') + json.dumps({
+				'id': show.id,
+				'venue_id': show.venue_id,
+				'venue_name': show.venue_name,
+				'artist_id': show.artist_id,
+				'artist_name': show.artist_name,
+				'artist_image_link': show.artist_image_link,
+				'start_time': show.start_time.isoformat()
+			})
+		yield ']'
+
+	return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+@bp.route('/shows/create')
 def create_shows():
 	# renders form. do not touch.
 	form = ShowForm()
 	return render_template('forms/new_show.html', form=form)
 
 
-@app.route('/shows/create', methods=['POST'])
+@bp.route('/shows/create', methods=['POST'])
 def create_show_submission():
 	# called to create new shows in the db, upon submitting new show listing form
 	# TODO: insert form data as a new Show record in the db, instead
 	try:
 		show_form = ShowForm(request.form)
+		# Durations are bounded (1..MAX_SHOW_MINUTES): overlap checks only look
+		# that far back for shows still running.
+		if not show_form.validate():
+			flash('Show could not be listed: {}.'.format('; '.join(
+				'{} {}'.format(name, error.rstrip('.')) for name, errors in show_form.errors.items() for error in errors)))
+			return render_template('pages/home.html')
+		end_time = show_form.start_time.data + timedelta(minutes=show_form.duration.data)
+		if not (Venue.exists(int(show_form.venue_id.data)) and Artist.exists(int(show_form.artist_id.data))):
+			flash('Show could not be listed: there is no such venue or artist.')
+			return render_template('pages/home.html')
+		conflicts = show_conflicts([(int(show_form.venue_id.data), int(show_form.artist_id.data),
+									 show_form.start_time.data, end_time)])
+		if conflicts:
+			flash('Show could not be listed: {}.'.format(conflicts[0][1]))
+			return render_template('pages/home.html')
 		new_show = Show.insert().values(
 			Artist_id=show_form.artist_id.data,
 			Venue_id=show_form.venue_id.data,
-			start_time=show_form.start_time.data
+			start_time=show_form.start_time.data,
+			end_time=end_time
 		)
 		db.session.execute(new_show)
+		count_show(show_form.venue_id.data, show_form.artist_id.data, show_form.start_time.data)
 		db.session.commit()
+		page_cache.invalidate('venues',
+							  'venue:{}'.format(show_form.venue_id.data),
+							  'artist:{}'.format(show_form.artist_id.data),
+							  *availability_tags([(None, None, show_form.start_time.data, end_time)]))
 		# on successful db insert, flash success
 		flash('Show was successfully listed!')
+	except IntegrityError as error:
+		db.session.rollback()
+		if getattr(error.orig, 'pgcode', None) == '23P01':
+			# exclusion_violation: a concurrent booking took the slot.
+			flash('Show could not be listed: the venue or artist is already booked at that time.')
+		else:
+			flash('An error occurred. Show could not be listed.')
 	# TODO: on unsuccessful db insert, flash an error instead.
 	except:
 		db.session.rollback()
@@ -584,37 +1591,169 @@ def create_show_submission():
 	return render_template('pages/home.html')
 
 
-@app.errorhandler(404)
+#  Autocomplete
+#  ----------------------------------------------------------------
+
+AUTOCOMPLETE_MODELS = {'artist': Artist, 'venue': Venue}
+
+
+@bp.route('/autocomplete')
+# 0, or 2 when the prefix indexes are (re)built.
+@query_budget(2)
+def autocomplete():
+	# Name prefix matches for ?q=, from the in-process prefix indexes;
+	# ?type=artist or ?type=venue limits them to one kind.
+	kind = request.args.get('type')
+	if kind and kind not in AUTOCOMPLETE_MODELS:
+		abort(400)
+	limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+	results = []
+	for name in [kind] if kind else sorted(AUTOCOMPLETE_MODELS):
+		results += [{'type': name, 'id': item_id, 'name': item_name} for item_id, item_name
+					in AUTOCOMPLETE_MODELS[name].prefix_index().search(request.args.get('q', ''), limit)]
+	return jsonify({'results': results[:limit]})
+
+
+#  Bulk import
+#  ----------------------------------------------------------------
+
+def require_admin_token():
+	# The /admin endpoints take the IMPORT_API_TOKEN from config as a
+	# bearer token, and are disabled while it is unset.
+	token = current_app.config.get('IMPORT_API_TOKEN')
+	if not token or request.headers.get('Authorization') != 'Bearer ' + token:
+		abort(403)
+
+
+@bp.route('/admin/import/<kind>', methods=['POST'])
+def import_submission(kind):
+	# Streams one JSON line of running totals per committed batch.
+	require_admin_token()
+	upload = request.files.get('file')
+	if kind not in IMPORTS or upload is None:
+		abort(400)
+	try:
+		format = request.form.get('format') or importer.detect_format(upload.filename)
+	except ValueError:
+		abort(400)
+	batch_size = request.form.get('batch_size', current_app.config['IMPORT_BATCH_SIZE'], type=int)
+
+	def generate():
+		result = None
+		for result in import_file(kind, upload.stream, format, batch_size):
+			yield json.dumps(dict(result, errors=len(result['errors']))) + '\n'
+		yield json.dumps(dict(result, done=True)) + '\n'
+
+	return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@bp.cli.command('import-data')
+@click.argument('kind', type=click.Choice(sorted(IMPORTS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', type=click.Choice(importer.FORMATS), help='Defaults to the file extension.')
+@click.option('--batch-size', type=int, default=None)
+def import_data_command(kind, path, format, batch_size):
+	"""Bulk import venues, artists or shows from a CSV/JSON file."""
+	with open(path, 'rb') as f:
+		for result in import_file(kind, f, format or importer.detect_format(path),
+								  batch_size or current_app.config['IMPORT_BATCH_SIZE']):
+			click.echo('{rows} rows read, {imported} imported, {rejected} rejected'.format(**result), err=True)
+	for error in result['errors']:
+		click.echo('line {line}: {message}'.format(**error))
+	click.echo('{rows} rows read, {imported} imported, {rejected} rejected'.format(**result))
+
+
+#  Bulk delete
+#  ----------------------------------------------------------------
+
+@bp.route('/admin/delete/<kind>', methods=['POST'])
+def delete_submission(kind):
+	# Deletes the venues or artists listed in the JSON body, e.g.
+	# {"ids": [1, 2, 3], "soft": true}, and reports the rows affected.
+	require_admin_token()
+	body = request.get_json(silent=True) or {}
+	ids = body.get('ids')
+	if (kind not in DELETABLE or not isinstance(ids, list) or not ids
+			or len(ids) > current_app.config['DELETE_MAX_IDS']
+			or not all(isinstance(item_id, int) and not isinstance(item_id, bool) for item_id in ids)):
+		abort(400)
+	soft = bool(body.get('soft'))
+	return jsonify({'deleted': delete_records(kind, ids, soft=soft), 'soft': soft})
+
+
+@bp.cli.command('delete-records')
+@click.argument('kind', type=click.Choice(sorted(DELETABLE)))
+@click.argument('ids', type=int, nargs=-1, required=True)
+@click.option('--soft', is_flag=True, help='Only mark them deleted; purge-deleted removes the rows.')
+def delete_records_command(kind, ids, soft):
+	"""Delete venues or artists, with their shows."""
+	counts = delete_records(kind, ids, soft=soft)
+	click.echo(', '.join('{} {}'.format(n, name) for name, n in sorted(counts.items())) + ' deleted')
+
+
+@bp.cli.command('purge-deleted')
+@click.option('--batch-size', type=int, default=None)
+def purge_deleted_command(batch_size):
+	"""Remove soft-deleted venues and artists, with their shows, in small batches."""
+	for kind in sorted(DELETABLE):
+		counts = None
+		for counts in purge_deleted(kind, batch_size or current_app.config['PURGE_BATCH_SIZE']):
+			pass
+		click.echo(', '.join('{} {}'.format(n, name) for name, n in sorted(counts.items())) + ' purged'
+				   if counts else 'no {} to purge'.format(kind))
+
+
+#  Show counters
+#  ----------------------------------------------------------------
+
+@bp.cli.command('roll-show-counters')
+def roll_show_counters_command():
+	"""Move shows that have started from upcoming to past counts."""
+	roll_show_counters()
+
+
+@bp.cli.command('recount-shows')
+def recount_shows_command():
+	"""Rebuild every venue and artist show counter from scratch."""
+	recount_shows()
+
+
+@bp.cli.command('geocode-venues')
+def geocode_venues_command():
+	"""Place every venue from the gazetteer, e.g. after extending it."""
+	# One UPDATE per place rather than per venue.
+	located = 0
+	for city, state in db.session.query(Venue.city, Venue.state).distinct().all():
+		location = venue_location(city, state)
+		updated = (Venue.query.filter(Venue.city == city, Venue.state == state)
+				   .update(location, synchronize_session=False))
+		if location['geohash']:
+			located += updated
+	db.session.commit()
+	click.echo('{} venues located'.format(located))
+
+
+@bp.app_errorhandler(404)
 def not_found_error(error):
 	return render_template('errors/404.html'), 404
 
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def server_error(error):
 	return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-	file_handler = FileHandler('error.log')
-	file_handler.setFormatter(
-		Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-	)
-	app.logger.setLevel(logging.INFO)
-	file_handler.setLevel(logging.INFO)
-	app.logger.addHandler(file_handler)
-	app.logger.info('errors')
-
 # ----------------------------------------------------------------------------#
 # Launch.
 # ----------------------------------------------------------------------------#
 
 # Default port:
 if __name__ == '__main__':
-	app.run()
+	create_app().run()
 
 # Or specify port manually:
 '''
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 '''
@@ -0,0 +1,77 @@
+'''
+Measures how long a fresh worker takes to become ready: importing app.py,
+building the app with create_app() and serving its first request, each in
+a new Python process, the way a gunicorn worker boots. Also counts the
+database connections opened along the way, and times db.create_all()
+against the same database for comparison with the old import-time
+schema check.
+
+	python benchmarks/app_startup.py --database-url postgresql://localhost/fyyur_bench
+
+create_all() creates any missing tables, so point it at a scratch database.
+'''
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+STARTER_CODE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in each child process and prints its timings as JSON.
+CHILD = '''
+import json, sys, time
+start = time.perf_counter()
+import sqlalchemy as sa
+connections = []
+sa.event.listen(sa.pool.Pool, 'connect', lambda *args: connections.append(1))
+timings = {}
+import app as fyyur
+timings['import'] = time.perf_counter() - start
+mark = time.perf_counter()
+application = fyyur.create_app({'SQLALCHEMY_DATABASE_URI': sys.argv[1]})
+timings['create_app'] = time.perf_counter() - mark
+mark = time.perf_counter()
+application.test_client().get('/')
+timings['first_request'] = time.perf_counter() - mark
+timings['ready'] = time.perf_counter() - start
+timings['connections'] = len(connections)
+if sys.argv[2] == '1':
+	mark = time.perf_counter()
+	with application.app_context():
+		fyyur.db.create_all()
+	timings['create_all'] = time.perf_counter() - mark
+print(json.dumps(timings))
+'''
+
+STEPS = ['import', 'create_app', 'first_request', 'ready', 'create_all']
+
+
+def run_child(database_url, create_all):
+	output = subprocess.check_output(
+		[sys.executable, '-c', CHILD, database_url, '1' if create_all else '0'],
+		cwd=STARTER_CODE, env=dict(os.environ, PYTHONDONTWRITEBYTECODE='1'))
+	return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument('--database-url', required=True)
+	parser.add_argument('--runs', type=int, default=20)
+	parser.add_argument('--skip-create-all', action='store_true')
+	args = parser.parse_args()
+
+	results = [run_child(args.database_url, not args.skip_create_all) for _ in range(args.runs)]
+	print('{} cold starts'.format(args.runs))
+	for step in STEPS:
+		timings = [result[step] * 1000 for result in results if step in result]
+		if timings:
+			print('{:<14} median {:8.2f} ms   max {:8.2f} ms'.format(
+				step, statistics.median(timings), max(timings)))
+	print('database connections before the first query: {}'.format(
+		max(result['connections'] for result in results)))
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,188 @@
+'''
+Seeds a scratch database with venues, artists and shows, then reports query
+plans and timings for the Show queries behind the venue/artist detail pages,
+the /venues directory and the /shows listing, with and without the Show
+indexes.
+
+	python benchmarks/show_indexes.py --database-url postgresql://localhost/fyyur_bench
+
+Never point it at a database you care about: it drops and recreates the
+Show indexes, and seeding appends rows.
+'''
+import argparse
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+SHOW_INDEXES = [
+	('ix_Show_Venue_id_start_time', ['Venue_id', 'start_time']),
+	('ix_Show_Artist_id_start_time', ['Artist_id', 'start_time']),
+	('ix_Show_start_time_id', ['start_time', 'id']),
+]
+
+metadata = sa.MetaData()
+
+venue_table = sa.Table('Venue', metadata,
+	sa.Column('id', sa.Integer, primary_key=True),
+	sa.Column('name', sa.String),
+	sa.Column('city', sa.String(120)),
+	sa.Column('state', sa.String(120)),
+	sa.Column('image_link', sa.String(500)))
+
+artist_table = sa.Table('Artist', metadata,
+	sa.Column('id', sa.Integer, primary_key=True),
+	sa.Column('name', sa.String),
+	sa.Column('city', sa.String(120)),
+	sa.Column('state', sa.String(120)),
+	sa.Column('image_link', sa.String(500)))
+
+show_table = sa.Table('Show', metadata,
+	sa.Column('id', sa.Integer, primary_key=True),
+	sa.Column('Venue_id', sa.Integer, sa.ForeignKey('Venue.id')),
+	sa.Column('Artist_id', sa.Integer, sa.ForeignKey('Artist.id')),
+	sa.Column('start_time', sa.DateTime),
+	sa.Column('end_time', sa.DateTime))
+
+# The statements the app issues, in the shape SQLAlchemy renders them.
+QUERIES = {
+	'venue detail shows': '''
+		SELECT "Artist".id, "Artist".name, "Artist".image_link, "Show".start_time
+		FROM "Show" JOIN "Artist" ON "Show"."Artist_id" = "Artist".id
+		WHERE "Show"."Venue_id" = :venue_id
+		ORDER BY "Show".start_time''',
+	'artist detail shows': '''
+		SELECT "Venue".id, "Venue".name, "Venue".image_link, "Show".start_time
+		FROM "Show" JOIN "Venue" ON "Show"."Venue_id" = "Venue".id
+		WHERE "Show"."Artist_id" = :artist_id
+		ORDER BY "Show".start_time''',
+	'venue upcoming count': '''
+		SELECT count(*) FROM "Show"
+		WHERE "Show"."Venue_id" = :venue_id AND "Show".start_time > :now''',
+	'shows page': '''
+		SELECT "Show".id, "Show".start_time FROM "Show"
+		WHERE "Show".start_time > :now
+		ORDER BY "Show".start_time, "Show".id
+		LIMIT 20''',
+}
+
+
+def seed(engine, venues, artists, shows, batch_size):
+	metadata.create_all(engine)
+	with engine.begin() as conn:
+		first_venue = (conn.execute(sa.select([sa.func.max(venue_table.c.id)])).scalar() or 0) + 1
+		first_artist = (conn.execute(sa.select([sa.func.max(artist_table.c.id)])).scalar() or 0) + 1
+		conn.execute(venue_table.insert(), [
+			{'id': i, 'name': 'Venue {}'.format(i), 'city': 'City {}'.format(i % 50), 'state': 'CA'}
+			for i in range(first_venue, first_venue + venues)])
+		conn.execute(artist_table.insert(), [
+			{'id': i, 'name': 'Artist {}'.format(i), 'city': 'City {}'.format(i % 50), 'state': 'CA'}
+			for i in range(first_artist, first_artist + artists)])
+
+	now = datetime.now()
+	span = int(timedelta(days=3 * 365).total_seconds())
+	inserted = 0
+	while inserted < shows:
+		count = min(batch_size, shows - inserted)
+		rows = [{'Venue_id': random.randrange(first_venue, first_venue + venues),
+				 'Artist_id': random.randrange(first_artist, first_artist + artists),
+				 'start_time': now + timedelta(seconds=random.randint(-span, span))}
+				for _ in range(count)]
+		for row in rows:
+			row['end_time'] = row['start_time'] + timedelta(hours=2)
+		with engine.begin() as conn:
+			conn.execute(show_table.insert(), rows)
+		inserted += count
+		print('seeded {}/{} shows'.format(inserted, shows), file=sys.stderr)
+	return first_venue, first_artist
+
+
+def drop_indexes(engine):
+	existing = set(index['name'] for index in sa.inspect(engine).get_indexes('Show'))
+	with engine.begin() as conn:
+		for name, columns in SHOW_INDEXES:
+			if name in existing:
+				sa.Index(name, *[show_table.c[column] for column in columns]).drop(conn)
+
+
+def create_indexes(engine):
+	existing = set(index['name'] for index in sa.inspect(engine).get_indexes('Show'))
+	with engine.begin() as conn:
+		for name, columns in SHOW_INDEXES:
+			if name not in existing:
+				sa.Index(name, *[show_table.c[column] for column in columns]).create(conn)
+		conn.execute(sa.text('ANALYZE'))
+
+
+def explain(conn, sql, params):
+	if conn.dialect.name == 'postgresql':
+		statement = 'EXPLAIN (ANALYZE, BUFFERS) ' + sql
+	else:
+		statement = 'EXPLAIN QUERY PLAN ' + sql
+	return [' '.join(str(column) for column in row) for row in conn.execute(sa.text(statement), params)]
+
+
+def measure(engine, venue_ids, artist_ids, runs):
+	now = datetime.now()
+	report = {}
+	with engine.connect() as conn:
+		for label, sql in QUERIES.items():
+			timings = []
+			for run in range(runs):
+				params = {'venue_id': random.choice(venue_ids),
+						  'artist_id': random.choice(artist_ids),
+						  'now': now}
+				start = time.perf_counter()
+				conn.execute(sa.text(sql), params).fetchall()
+				timings.append((time.perf_counter() - start) * 1000)
+			report[label] = {
+				'median_ms': statistics.median(timings),
+				'max_ms': max(timings),
+				'plan': explain(conn, sql, params),
+			}
+	return report
+
+
+def print_report(title, report):
+	print('== {} =='.format(title))
+	for label, result in report.items():
+		print('{:<22} median {:8.2f} ms   max {:8.2f} ms'.format(
+			label, result['median_ms'], result['max_ms']))
+		for line in result['plan']:
+			print('    ' + line)
+	print()
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument('--database-url', required=True)
+	parser.add_argument('--venues', type=int, default=2000)
+	parser.add_argument('--artists', type=int, default=10000)
+	parser.add_argument('--shows', type=int, default=1000000)
+	parser.add_argument('--batch-size', type=int, default=10000)
+	parser.add_argument('--runs', type=int, default=50)
+	parser.add_argument('--skip-seed', action='store_true')
+	args = parser.parse_args()
+
+	engine = sa.create_engine(args.database_url)
+	if not args.skip_seed:
+		seed(engine, args.venues, args.artists, args.shows, args.batch_size)
+	with engine.connect() as conn:
+		venue_ids = [row[0] for row in conn.execute(sa.select([venue_table.c.id]))]
+		artist_ids = [row[0] for row in conn.execute(sa.select([artist_table.c.id]))]
+		total = conn.execute(sa.select([sa.func.count()]).select_from(show_table)).scalar()
+	print('{} venues, {} artists, {} shows\n'.format(len(venue_ids), len(artist_ids), total))
+
+	drop_indexes(engine)
+	with engine.begin() as conn:
+		conn.execute(sa.text('ANALYZE'))
+	print_report('without Show indexes', measure(engine, venue_ids, artist_ids, args.runs))
+	create_indexes(engine)
+	print_report('with Show indexes', measure(engine, venue_ids, artist_ids, args.runs))
+
+
+if __name__ == '__main__':
+	main()
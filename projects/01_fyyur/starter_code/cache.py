@@ -0,0 +1,243 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+from werkzeug.http import is_resource_modified
+
+from routing import reads_from_replica
+
+# ----------------------------------------------------------------------------#
+# Cache backends.
+#
+# Both expose get/set/delete. LRUCache lives in the worker's memory;
+# FileSystemCache keeps entries in a directory, so every worker on the host
+# shares them (and their invalidations), standing in for a shared cache
+# such as memcached or Redis.
+# ----------------------------------------------------------------------------#
+
+
+class NullCache(object):
+
+	def get(self, key):
+		return None
+
+	def set(self, key, value, timeout=None):
+		pass
+
+	def delete(self, key):
+		pass
+
+
+class LRUCache(object):
+
+	def __init__(self, max_entries=1000, default_timeout=300):
+		self.max_entries = max_entries
+		self.default_timeout = default_timeout
+		self.entries = OrderedDict()
+		self.lock = threading.Lock()
+
+	def get(self, key):
+		with self.lock:
+			entry = self.entries.get(key)
+			if entry is None:
+				return None
+			expires, value = entry
+			if expires and expires < time.time():
+				del self.entries[key]
+				return None
+			self.entries.move_to_end(key)
+			return value
+
+	def set(self, key, value, timeout=None):
+		timeout = self.default_timeout if timeout is None else timeout
+		expires = time.time() + timeout if timeout else 0
+		with self.lock:
+			self.entries[key] = (expires, value)
+			self.entries.move_to_end(key)
+			while len(self.entries) > self.max_entries:
+				self.entries.popitem(last=False)
+
+	def delete(self, key):
+		with self.lock:
+			self.entries.pop(key, None)
+
+
+class FileSystemCache(object):
+
+	def __init__(self, directory, default_timeout=300, max_entries=1000):
+		self.directory = directory
+		self.default_timeout = default_timeout
+		self.max_entries = max_entries
+		self.writes = 0
+		os.makedirs(directory, exist_ok=True)
+
+	def path(self, key):
+		return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+	def get(self, key):
+		try:
+			with open(self.path(key), 'rb') as f:
+				expires, value = pickle.load(f)
+		except (IOError, OSError, EOFError, pickle.UnpicklingError):
+			return None
+		if expires and expires < time.time():
+			self.delete(key)
+			return None
+		return value
+
+	def set(self, key, value, timeout=None):
+		timeout = self.default_timeout if timeout is None else timeout
+		expires = time.time() + timeout if timeout else 0
+		# Write to a temporary file and rename it over the entry, so readers
+		# in other workers never see a partial write.
+		fd, tmp = tempfile.mkstemp(dir=self.directory)
+		with os.fdopen(fd, 'wb') as f:
+			pickle.dump((expires, value), f, pickle.HIGHEST_PROTOCOL)
+		os.replace(tmp, self.path(key))
+		self.writes += 1
+		if self.writes % 100 == 0:
+			self.prune()
+
+	def prune(self):
+		# Drops the least recently written half once the directory is full.
+		paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory)]
+		if len(paths) <= self.max_entries:
+			return
+		paths.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0)
+		for path in paths[:len(paths) // 2]:
+			try:
+				os.remove(path)
+			except OSError:
+				pass
+
+	def delete(self, key):
+		try:
+			os.remove(self.path(key))
+		except OSError:
+			pass
+
+
+def make_backend(config):
+	cache_type = config.get('CACHE_TYPE', 'lru')
+	timeout = config.get('CACHE_DEFAULT_TIMEOUT', 300)
+	if cache_type == 'lru':
+		return LRUCache(config.get('CACHE_MAX_ENTRIES', 1000), timeout)
+	if cache_type == 'filesystem':
+		return FileSystemCache(config['CACHE_DIR'], timeout, config.get('CACHE_MAX_ENTRIES', 1000))
+	if cache_type == 'null':
+		return NullCache()
+	raise ValueError('Unknown CACHE_TYPE {!r}'.format(cache_type))
+
+
+# ----------------------------------------------------------------------------#
+# Page cache.
+#
+# Rendered pages are stored under their URL plus the current version of
+# each tag they depend on (e.g. "venues", "venue:3"). Invalidating a tag
+# gives it a new version, which orphans every page built on the old one.
+# Under conditional(), the key also holds the page's ETag, so a cached body
+# is only ever sent with the validators it was rendered for. Pages read
+# from a replica are served but not stored: rendered right after a write,
+# they may predate it, and would outlive the replica's lag in the cache.
+# ----------------------------------------------------------------------------#
+
+
+class PageCache(object):
+
+	def __init__(self, backend=None):
+		self.backend = backend or NullCache()
+
+	def init_app(self, app):
+		self.backend = make_backend(app.config)
+
+	def tag_version(self, tag):
+		version = self.backend.get('tag:' + tag)
+		if version is None:
+			version = self.invalidate(tag)
+		return version
+
+	def invalidate(self, *tags):
+		version = None
+		for tag in tags:
+			version = uuid.uuid4().hex
+			self.backend.set('tag:' + tag, version, timeout=0)
+		return version
+
+	def tagged_key(self, key, tags):
+		# A key that changes whenever any of the tags is invalidated.
+		return '{}:{}'.format(key, ':'.join(self.tag_version(tag) for tag in tags))
+
+	def cached(self, tags):
+		'''
+		Caches the rendered output of a GET view. tags is called with the
+		view's arguments and returns the tags the page depends on.
+		'''
+		def decorator(view):
+			@wraps(view)
+			def wrapper(*args, **kwargs):
+				# Pending flash messages are rendered into the layout, so
+				# those responses must not be served from, or stored in, the cache.
+				if request.method != 'GET' or session.get('_flashes'):
+					return view(*args, **kwargs)
+				key = self.tagged_key('page:' + request.full_path, tags(*args, **kwargs))
+				if g.get('page_etag'):
+					key = '{}:{}'.format(key, g.page_etag)
+				page = self.backend.get(key)
+				if page is None:
+					page = view(*args, **kwargs)
+					if not isinstance(page, str):
+						return page
+					if not reads_from_replica(current_app):
+						self.backend.set(key, page)
+				return page
+			return wrapper
+		return decorator
+
+
+# ----------------------------------------------------------------------------#
+# Conditional requests.
+#
+# Pages carry an ETag and Last-Modified derived from cheap version data
+# (timestamps, counts) rather than from the rendered body, so a client or
+# CDN revalidating an unchanged page gets a 304 before the view, and its
+# queries, run at all.
+# ----------------------------------------------------------------------------#
+
+
+def conditional(version):
+	'''
+	Answers conditional GETs for a view. version is called with the view's
+	arguments and returns (etag, last_modified) for what the page would be
+	rendered from, or None to leave the request to the view (e.g. a 404).
+	'''
+	def decorator(view):
+		@wraps(view)
+		def wrapper(*args, **kwargs):
+			# Like cached pages, responses carrying flash messages are one-offs.
+			if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+				return view(*args, **kwargs)
+			current = version(*args, **kwargs)
+			if current is None:
+				return view(*args, **kwargs)
+			etag, last_modified = current
+			g.page_etag = etag
+			if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+				response = make_response('', 304)
+			else:
+				response = make_response(view(*args, **kwargs))
+				if response.status_code != 200:
+					return response
+			response.set_etag(etag)
+			response.last_modified = last_modified
+			# Caches may keep the page but must revalidate it on every use.
+			response.cache_control.no_cache = True
+			return response
+		return wrapper
+	return decorator
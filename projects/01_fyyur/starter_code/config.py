@@ -6,9 +6,90 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 # Enable debug mode.
 DEBUG = True
 
+# Outside debug mode, log records are written as JSON lines by a background
+# thread, LOG_BATCH_SIZE at a time, rotating LOG_FILE at LOG_MAX_BYTES.
+# Records beyond LOG_QUEUE_SIZE waiting to be written are dropped.
+LOG_FILE = 'error.log'
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_BATCH_SIZE = 100
+LOG_QUEUE_SIZE = 10000
+
 # Connect to the database
 
 
 # TODO IMPLEMENT DATABASE URL
 SQLALCHEMY_DATABASE_URI = 'postgresql://razanfahad@127.0.0.1:5432/fyyurapp'
-SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool per worker process: up to pool_size + max_overflow
+# connections, checked with a ping before use and replaced after
+# pool_recycle seconds, so connections dropped by the server or a proxy
+# are not handed to requests.
+SQLALCHEMY_ENGINE_OPTIONS = {
+    'pool_size': int(os.environ.get('DATABASE_POOL_SIZE', 5)),
+    'max_overflow': int(os.environ.get('DATABASE_MAX_OVERFLOW', 10)),
+    'pool_timeout': 30,
+    'pool_recycle': 1800,
+    'pool_pre_ping': True,
+}
+
+# Optional read replica. When set, GET requests to these endpoints read
+# from it; everything else uses SQLALCHEMY_DATABASE_URI.
+SQLALCHEMY_REPLICA_URI = os.environ.get('DATABASE_REPLICA_URL')
+SQLALCHEMY_READ_ENDPOINTS = [
+    'main.venues',
+    'main.artists',
+    'main.shows',
+    'main.shows_json',
+    'main.show_venue',
+    'main.show_artist',
+    'main.venues_availability',
+    'main.autocomplete',
+    'main.venues_near',
+]
+
+# Search results shown per page on /venues/search and /artists/search
+SEARCH_RESULTS_PER_PAGE = 10
+
+# Shows per page on /shows, and rows fetched per batch when streaming them
+SHOWS_PER_PAGE = 30
+SHOWS_STREAM_BATCH_SIZE = 500
+
+# Seconds before a worker rebuilds its /autocomplete name index from the
+# database, picking up names created or edited through other workers
+AUTOCOMPLETE_REFRESH_SECONDS = 300
+
+# Longest date range, in days, one /venues/availability query may cover
+AVAILABILITY_MAX_DAYS = 62
+
+# Offline geocoder: venues are placed at their city's coordinates from this
+# CSV (city, state, latitude, longitude)
+GAZETTEER_FILE = os.path.join(basedir, 'data', 'us_cities.csv')
+
+# Default and largest ?radius=, in kilometres, of /venues/near
+VENUES_NEAR_RADIUS_KM = 25
+VENUES_NEAR_MAX_RADIUS_KM = 500
+
+# Count the SQL queries each view issues and warn (raise under TESTING)
+# when one goes over the budget declared with @query_budget
+CHECK_QUERY_BUDGETS = DEBUG
+
+# Rendered page cache: 'lru' keeps pages in each worker's memory,
+# 'filesystem' shares them between the workers on a host through CACHE_DIR,
+# 'null' disables caching.
+CACHE_TYPE = 'lru'
+CACHE_DIR = os.path.join(basedir, '.cache')
+CACHE_DEFAULT_TIMEOUT = 300
+CACHE_MAX_ENTRIES = 1000
+
+# Bulk imports: rows per transaction, and the bearer token required by
+# POST /admin/import/<kind> and /admin/delete/<kind> (both are disabled
+# while it is unset)
+IMPORT_BATCH_SIZE = 1000
+IMPORT_API_TOKEN = os.environ.get('IMPORT_API_TOKEN')
+
+# Bulk deletes: most ids one POST /admin/delete/<kind> may name, and rows
+# `flask purge-deleted` removes per transaction
+DELETE_MAX_IDS = 1000
+PURGE_BATCH_SIZE = 1000
@@ -1,7 +1,10 @@
 from datetime import datetime
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, IntegerField
+from wtforms.validators import DataRequired, AnyOf, URL, NumberRange
+
+# Longest show that can be booked, in minutes.
+MAX_SHOW_MINUTES = 24 * 60
 
 class ShowForm(Form):
     artist_id = StringField(
@@ -15,6 +18,11 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    duration = IntegerField(
+        'duration',
+        validators=[NumberRange(min=1, max=MAX_SHOW_MINUTES)],
+        default=120
+    )
 
 class VenueForm(Form):
     name = StringField(
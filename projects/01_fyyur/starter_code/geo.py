@@ -0,0 +1,116 @@
+import csv
+import math
+from functools import lru_cache
+
+# ----------------------------------------------------------------------------#
+# Geohashes.
+#
+# A geohash interleaves longitude and latitude bits into a base32 string,
+# so points in the same cell share a prefix and every cell is one
+# contiguous range of an ordinary B-tree index. The cell around a point and
+# its eight neighbours cover every point within covered_km of it, which
+# bounds how far one set of range scans can search.
+# ----------------------------------------------------------------------------#
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+EARTH_RADIUS_KM = 6371.0088
+
+
+def geohash(lat, lon, precision=9):
+	lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+	chars = []
+	value = bits = 0
+	even = True
+	while len(chars) < precision:
+		bounds, coordinate = (lon_range, lon) if even else (lat_range, lat)
+		middle = (bounds[0] + bounds[1]) / 2
+		if coordinate >= middle:
+			value = value * 2 + 1
+			bounds[0] = middle
+		else:
+			value = value * 2
+			bounds[1] = middle
+		even = not even
+		bits += 1
+		if bits == 5:
+			chars.append(BASE32[value])
+			value = bits = 0
+	return ''.join(chars)
+
+
+def cell_size(precision):
+	# (height, width) of a cell, in degrees.
+	bits = 5 * precision
+	return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** (bits - bits // 2)
+
+
+def geohash_cells(lat, lon, precision):
+	# The cell holding the point and the (up to) eight around it.
+	height, width = cell_size(precision)
+	cells = set()
+	for lat_step in (-height, 0, height):
+		for lon_step in (-width, 0, width):
+			if -90 <= lat + lat_step <= 90:
+				cells.add(geohash(lat + lat_step, (lon + lon_step + 180) % 360 - 180, precision))
+	return sorted(cells)
+
+
+def cell_ranges(cells):
+	'''
+	Merges geohash cells into [low, high) ranges of the strings that start
+	with them; high is None when a range runs to the end of the index.
+	'''
+	ranges = []
+	for cell in cells:
+		carry = cell.rstrip('z')
+		high = carry[:-1] + BASE32[BASE32.index(carry[-1]) + 1] if carry else None
+		if ranges and ranges[-1][1] == cell:
+			ranges[-1] = (ranges[-1][0], high)
+		else:
+			ranges.append((cell, high))
+	return ranges
+
+
+def covered_km(lat, precision):
+	# Any point closer than this to (lat, lon) is in geohash_cells(lat, lon).
+	height, width = cell_size(precision)
+	north_south = math.radians(height)
+	east_west = math.asin(min(1.0, math.cos(math.radians(lat)) * math.sin(math.radians(min(width, 90.0)))))
+	return EARTH_RADIUS_KM * min(north_south, east_west)
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+	lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+	a = (math.sin((lat2 - lat1) / 2) ** 2
+		 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+	return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+# ----------------------------------------------------------------------------#
+# Offline geocoding.
+#
+# Venues are placed at their city's coordinates, looked up in a CSV
+# gazetteer (city, state, latitude, longitude) shipped with the app, so
+# creating or importing venues never waits on a geocoding service.
+# ----------------------------------------------------------------------------#
+
+
+def place_key(city, state):
+	city = ' '.join(city.lower().replace('.', '').split())
+	if city.startswith('saint '):
+		city = 'st ' + city[len('saint '):]
+	return city, state.strip().upper()
+
+
+@lru_cache(maxsize=None)
+def gazetteer(path):
+	with open(path, newline='', encoding='utf-8') as f:
+		return dict((place_key(row['city'], row['state']), (float(row['latitude']), float(row['longitude'])))
+					for row in csv.DictReader(f))
+
+
+def geocode(city, state, path):
+	# (latitude, longitude), or None for places the gazetteer doesn't know.
+	if not city or not state:
+		return None
+	return gazetteer(path).get(place_key(city, state))
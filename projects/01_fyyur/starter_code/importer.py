@@ -0,0 +1,136 @@
+import codecs
+import csv
+import json
+
+from werkzeug.datastructures import MultiDict
+
+# ----------------------------------------------------------------------------#
+# Bulk import pipeline.
+#
+# Records are streamed out of a CSV, JSON array or JSON lines file, checked
+# with the same WTForms form the web handlers use, and handed to an insert
+# callback in batches, one transaction per batch. Nothing here knows about
+# the models; app.py supplies the form and the insert callback per kind.
+# ----------------------------------------------------------------------------#
+
+FORMATS = ('csv', 'json', 'jsonl')
+
+
+def detect_format(filename):
+	extension = filename.rsplit('.', 1)[-1].lower()
+	if extension == 'ndjson':
+		return 'jsonl'
+	if extension not in FORMATS:
+		raise ValueError('Unsupported import file {!r}, expected one of {}'.format(
+			filename, ', '.join(FORMATS)))
+	return extension
+
+
+def text_stream(stream):
+	# Uploads and files opened with 'rb' yield bytes.
+	sample = stream.read(0)
+	if isinstance(sample, bytes):
+		return codecs.getreader('utf-8')(stream)
+	return stream
+
+
+def iter_json_array(stream, chunk_size=64 * 1024):
+	# Decodes one array element at a time instead of loading the whole file.
+	decoder = json.JSONDecoder()
+	buffer = ''
+	started = False
+	eof = False
+	while True:
+		position = 0
+		while True:
+			while position < len(buffer) and buffer[position] in ' \t\r\n,':
+				position += 1
+			if not started and position < len(buffer):
+				if buffer[position] != '[':
+					raise ValueError('Expected a JSON array of records')
+				started = True
+				position += 1
+				continue
+			if position < len(buffer) and buffer[position] == ']':
+				return
+			try:
+				record, position = decoder.raw_decode(buffer, position)
+			except ValueError:
+				if eof:
+					raise
+				break
+			yield record
+		buffer = buffer[position:]
+		if eof:
+			if buffer.strip():
+				raise ValueError('Truncated JSON array')
+			return
+		chunk = stream.read(chunk_size)
+		eof = not chunk
+		buffer += chunk
+
+
+def read_records(stream, format):
+	stream = text_stream(stream)
+	if format == 'csv':
+		return csv.DictReader(stream)
+	if format == 'json':
+		return iter_json_array(stream)
+	if format == 'jsonl':
+		return (json.loads(line) for line in stream if line.strip())
+	raise ValueError('Unsupported import format {!r}'.format(format))
+
+
+def form_data(record, multiple=('genres',)):
+	data = MultiDict()
+	for key, value in record.items():
+		if value is None:
+			continue
+		if key in multiple:
+			if isinstance(value, str):
+				value = value.split(',')
+			for item in value:
+				if str(item).strip():
+					data.add(key, str(item).strip())
+		else:
+			data.add(key, value if isinstance(value, str) else str(value))
+	return data
+
+
+def import_records(records, form_class, insert_batch, batch_size=1000, max_errors=100):
+	'''
+	Validates records with form_class and passes (line, form.data) pairs to
+	insert_batch in batches. insert_batch commits the batch and returns the
+	(line, message) pairs it rejected. Yields the running totals after every
+	batch; the last totals yielded are the final result.
+	'''
+	result = {'rows': 0, 'imported': 0, 'rejected': 0, 'errors': []}
+
+	def reject(line, message):
+		result['rejected'] += 1
+		if len(result['errors']) < max_errors:
+			result['errors'].append({'line': line, 'message': message})
+
+	def flush(batch):
+		rejected = insert_batch(batch)
+		for line, message in rejected:
+			reject(line, message)
+		result['imported'] += len(batch) - len(rejected)
+
+	batch = []
+	# Line 1 of a CSV file is its header.
+	for line, record in enumerate(records, start=2 if isinstance(records, csv.DictReader) else 1):
+		result['rows'] += 1
+		form = form_class(formdata=form_data(record), meta={'csrf': False})
+		if not form.validate():
+			reject(line, '; '.join('{}: {}'.format(field, ', '.join(errors))
+								   for field, errors in sorted(form.errors.items())))
+			continue
+		batch.append((line, form.data))
+		if len(batch) >= batch_size:
+			flush(batch)
+			batch = []
+			yield result
+	if batch:
+		flush(batch)
+	yield result
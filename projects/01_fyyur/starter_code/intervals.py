@@ -0,0 +1,71 @@
+# ----------------------------------------------------------------------------#
+# Interval tree.
+#
+# A static centered interval tree over half-open [start, end) intervals.
+# Each node keeps the intervals that contain its center point, sorted by
+# start and by end, so an overlap query walks one root-to-leaf path plus the
+# matches: O(log n + k) instead of comparing against every interval.
+# ----------------------------------------------------------------------------#
+
+
+class IntervalNode(object):
+
+	def __init__(self, center, intervals):
+		self.center = center
+		self.by_start = sorted(intervals, key=lambda interval: interval[0])
+		self.by_end = sorted(intervals, key=lambda interval: interval[1], reverse=True)
+		self.left = None
+		self.right = None
+
+
+class IntervalTree(object):
+
+	def __init__(self, intervals=()):
+		# intervals are (start, end, value) tuples; empty ones are ignored.
+		self.root = self.build([interval for interval in intervals if interval[0] < interval[1]])
+
+	def build(self, intervals):
+		if not intervals:
+			return None
+		# The median start is contained by at least its own interval, so
+		# every node takes something and the recursion always shrinks.
+		starts = sorted(interval[0] for interval in intervals)
+		center = starts[len(starts) // 2]
+		node = IntervalNode(center, [interval for interval in intervals
+									 if interval[0] <= center < interval[1]])
+		node.left = self.build([interval for interval in intervals if interval[1] <= center])
+		node.right = self.build([interval for interval in intervals if interval[0] > center])
+		return node
+
+	def overlapping(self, start, end):
+		'''
+		Returns the values of the intervals that overlap [start, end).
+		'''
+		found = []
+		node = self.root
+		stack = [node] if node else []
+		while stack:
+			node = stack.pop()
+			if end <= node.center:
+				# Everything here ends after the center, so it overlaps
+				# exactly when it starts before the query ends.
+				for interval in node.by_start:
+					if interval[0] >= end:
+						break
+					found.append(interval[2])
+				if node.left:
+					stack.append(node.left)
+			elif start > node.center:
+				for interval in node.by_end:
+					if interval[1] <= start:
+						break
+					found.append(interval[2])
+				if node.right:
+					stack.append(node.right)
+			else:
+				found.extend(interval[2] for interval in node.by_start)
+				if node.left:
+					stack.append(node.left)
+				if node.right:
+					stack.append(node.right)
+		return found
@@ -0,0 +1,174 @@
+import atexit
+import json
+import logging
+import queue
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, RotatingFileHandler
+
+from flask import has_request_context, request
+from flask.logging import default_handler
+
+# ----------------------------------------------------------------------------#
+# Asynchronous logging.
+#
+# Request threads only put records on an in-memory queue. A single writer
+# thread drains the queue in batches, formats them as JSON lines and writes
+# each batch with one flush, rotating the file by size. A slow disk delays
+# the writer, not the requests; if it stalls until the queue is full, new
+# records are dropped and counted rather than held in memory.
+# ----------------------------------------------------------------------------#
+
+
+class JSONFormatter(logging.Formatter):
+
+	def format(self, record):
+		entry = {
+			'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+			'level': record.levelname,
+			'logger': record.name,
+			'message': record.getMessage(),
+			'path': record.pathname,
+			'line': record.lineno,
+		}
+		if getattr(record, 'request', None):
+			entry['request'] = record.request
+		if record.exc_info and not record.exc_text:
+			record.exc_text = self.formatException(record.exc_info)
+		if record.exc_text:
+			entry['exception'] = record.exc_text
+		return json.dumps(entry)
+
+
+class RequestQueueHandler(QueueHandler):
+
+	def __init__(self, records, listener):
+		super(RequestQueueHandler, self).__init__(records)
+		self.listener = listener
+
+	def enqueue(self, record):
+		try:
+			self.queue.put_nowait(record)
+		except queue.Full:
+			self.listener.record_dropped()
+
+	def prepare(self, record):
+		# Runs on the request thread: capture what the writer thread can't
+		# see later (the request, the traceback) and drop what it can't pickle.
+		record = logging.makeLogRecord(record.__dict__)
+		record.msg = record.getMessage()
+		record.args = None
+		if record.exc_info:
+			record.exc_text = logging.Formatter().formatException(record.exc_info)
+			record.exc_info = None
+		if has_request_context():
+			record.request = {'method': request.method, 'path': request.full_path,
+							  'remote_addr': request.remote_addr}
+		return record
+
+
+class BatchingRotatingFileHandler(RotatingFileHandler):
+
+	def emit_batch(self, records):
+		lines = []
+		for record in records:
+			try:
+				lines.append(self.format(record) + self.terminator)
+			except Exception:
+				self.handleError(record)
+		with self.lock:
+			for line in lines:
+				if self.stream is None:
+					# Opened lazily (delay=True), and again after a rollover.
+					self.stream = self._open()
+				if self.maxBytes > 0 and self.stream.tell() and self.stream.tell() + len(line) >= self.maxBytes:
+					self.doRollover()
+					if self.stream is None:
+						self.stream = self._open()
+				self.stream.write(line)
+			if self.stream is not None:
+				self.stream.flush()
+
+
+class BatchingQueueListener(object):
+
+	def __init__(self, records, handler, batch_size=100):
+		self.records = records
+		self.handler = handler
+		self.batch_size = batch_size
+		self.thread = None
+		self.stopping = object()
+		self.dropped = 0
+		self.dropped_lock = threading.Lock()
+
+	def record_dropped(self):
+		with self.dropped_lock:
+			self.dropped += 1
+
+	def dropped_record(self):
+		# A warning for the records dropped since the last one, if any.
+		with self.dropped_lock:
+			dropped, self.dropped = self.dropped, 0
+		if not dropped:
+			return None
+		return logging.makeLogRecord({
+			'name': 'logs', 'levelno': logging.WARNING, 'levelname': 'WARNING',
+			'msg': '{} log records dropped: the log queue was full'.format(dropped)})
+
+	def start(self):
+		self.thread = threading.Thread(target=self.run, name='log-writer', daemon=True)
+		self.thread.start()
+
+	def run(self):
+		stop = False
+		while not stop:
+			batch = [self.records.get()]
+			while len(batch) < self.batch_size:
+				try:
+					batch.append(self.records.get_nowait())
+				except queue.Empty:
+					break
+			if self.stopping in batch:
+				stop = True
+				batch = [record for record in batch if record is not self.stopping]
+			dropped = self.dropped_record()
+			if dropped is not None:
+				batch.append(dropped)
+			if batch:
+				self.handler.emit_batch(batch)
+
+	def stop(self):
+		# Writes out everything queued so far, then ends the thread.
+		if self.thread is not None:
+			self.records.put(self.stopping)
+			self.thread.join()
+			self.thread = None
+			self.handler.close()
+
+
+def init_logging(app):
+	# app.logger is shared by every app with the same import name, so an
+	# app built again replaces the previous app's handler and writer thread.
+	for previous in list(app.logger.handlers):
+		if isinstance(previous, RequestQueueHandler):
+			app.logger.removeHandler(previous)
+			atexit.unregister(previous.listener.stop)
+			previous.listener.stop()
+
+	handler = BatchingRotatingFileHandler(
+		app.config['LOG_FILE'], maxBytes=app.config['LOG_MAX_BYTES'],
+		backupCount=app.config['LOG_BACKUP_COUNT'], delay=True)
+	handler.setFormatter(JSONFormatter())
+	records = queue.Queue(maxsize=app.config['LOG_QUEUE_SIZE'])
+	listener = BatchingQueueListener(records, handler, app.config['LOG_BATCH_SIZE'])
+	listener.start()
+	atexit.register(listener.stop)
+
+	# Flask's default handler writes to stderr on the request thread.
+	queue_handler = RequestQueueHandler(records, listener)
+	queue_handler.setLevel(logging.INFO)
+	app.logger.removeHandler(default_handler)
+	app.logger.setLevel(logging.INFO)
+	app.logger.addHandler(queue_handler)
+	app.extensions['log_listener'] = listener
+	return listener
@@ -0,0 +1,49 @@
+"""add missing profile columns
+
+Revision ID: a4f0c2d7e913
+Revises: d75273ada0b5
+Create Date: 2020-06-06 11:04:37.215903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4f0c2d7e913'
+down_revision = 'd75273ada0b5'
+branch_labels = None
+depends_on = None
+
+# These columns were only ever created by db.create_all() at import, so
+# databases set up before it was removed may already have them.
+COLUMNS = {
+    'Venue': [
+        sa.Column('website', sa.String(length=120), nullable=True),
+        sa.Column('seeking_talent', sa.Boolean(), nullable=True),
+        sa.Column('seeking_description', sa.String(length=500), nullable=True),
+    ],
+    'Artist': [
+        sa.Column('website', sa.String(length=120), nullable=True),
+        sa.Column('seeking_venue', sa.Boolean(), nullable=True),
+        sa.Column('seeking_description', sa.String(length=500), nullable=True),
+    ],
+}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table, columns in COLUMNS.items():
+        existing = set(column['name'] for column in inspector.get_columns(table))
+        missing = [column for column in columns if column.name not in existing]
+        if missing:
+            with op.batch_alter_table(table) as batch_op:
+                for column in missing:
+                    batch_op.add_column(column)
+
+
+def downgrade():
+    for table, columns in COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for column in reversed(columns):
+                batch_op.drop_column(column.name)
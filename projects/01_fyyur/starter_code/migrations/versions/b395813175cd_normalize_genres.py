@@ -0,0 +1,100 @@
+"""normalize genres
+
+Revision ID: b395813175cd
+Revises: d9a135267adf
+Create Date: 2020-05-09 14:03:12.284906
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b395813175cd'
+down_revision = 'd9a135267adf'
+branch_labels = None
+depends_on = None
+
+# (owner table, association table, owner key column)
+GENRE_LINKS = [
+    ('Venue', 'Venue_genre', 'Venue_id'),
+    ('Artist', 'Artist_genre', 'Artist_id'),
+]
+
+genre_table = sa.Table(
+    'Genre', sa.MetaData(),
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('name', sa.String),
+)
+
+
+def link_table(name, key):
+    return sa.table(name, sa.column('Genre_id', sa.Integer), sa.column(key, sa.Integer))
+
+
+def has_genres_column(bind, table):
+    return 'genres' in [column['name'] for column in sa.inspect(bind).get_columns(table)]
+
+
+def upgrade():
+    op.create_table('Genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for table, association, key in GENRE_LINKS:
+        op.create_table(association,
+        sa.Column('Genre_id', sa.Integer(), nullable=False),
+        sa.Column(key, sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['Genre_id'], ['Genre.id'], ),
+        sa.ForeignKeyConstraint([key], [table + '.id'], ),
+        sa.PrimaryKeyConstraint('Genre_id', key)
+        )
+        op.create_index(op.f('ix_{}_{}'.format(association, key)), association, [key], unique=False)
+
+    # Move the comma-joined strings into the association tables, then drop
+    # the old columns (and the trigram index on them along the way).
+    bind = op.get_bind()
+    genre_ids = {}
+    for table, association, key in GENRE_LINKS:
+        if not has_genres_column(bind, table):
+            continue
+        rows = bind.execute(sa.text(
+            'SELECT id, genres FROM "{}" WHERE genres IS NOT NULL'.format(table))).fetchall()
+        links = []
+        for row_id, genres in rows:
+            for name in sorted(set(name.strip() for name in genres.split(',') if name.strip())):
+                if name not in genre_ids:
+                    result = bind.execute(genre_table.insert().values(name=name))
+                    genre_ids[name] = result.inserted_primary_key[0]
+                links.append({'Genre_id': genre_ids[name], key: row_id})
+        if links:
+            op.bulk_insert(link_table(association, key), links)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('genres')
+
+
+def downgrade():
+    bind = op.get_bind()
+    for table, association, key in GENRE_LINKS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('genres', sa.String(length=120), nullable=True))
+        if bind.dialect.name == 'postgresql':
+            op.execute('CREATE INDEX ix_{}_genres_trgm ON "{}" USING gin (genres gin_trgm_ops)'.format(
+                table.lower(), table))
+        owner = sa.table(table, sa.column('id', sa.Integer), sa.column('genres', sa.String))
+        links = link_table(association, key)
+        rows = bind.execute(
+            sa.select([links.c[key], genre_table.c.name])
+            .select_from(links.join(genre_table, links.c.Genre_id == genre_table.c.id))
+            .order_by(links.c[key], genre_table.c.name)).fetchall()
+        genres = {}
+        for row_id, name in rows:
+            genres.setdefault(row_id, []).append(name)
+        for row_id, names in genres.items():
+            bind.execute(owner.update().where(owner.c.id == row_id).values(genres=','.join(names)))
+
+        op.drop_index(op.f('ix_{}_{}'.format(association, key)), table_name=association)
+        op.drop_table(association)
+    op.drop_table('Genre')
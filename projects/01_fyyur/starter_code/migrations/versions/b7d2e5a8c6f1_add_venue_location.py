@@ -0,0 +1,34 @@
+"""add venue location
+
+Revision ID: b7d2e5a8c6f1
+Revises: f3a7c9e1b254
+Create Date: 2020-06-27 14:31:08.774120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2e5a8c6f1'
+down_revision = 'f3a7c9e1b254'
+branch_labels = None
+depends_on = None
+
+# Existing venues are placed by running `flask geocode-venues` afterwards.
+
+
+def upgrade():
+    with op.batch_alter_table('Venue') as batch_op:
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('geohash', sa.String(length=12), nullable=True))
+        batch_op.create_index('ix_Venue_geohash', ['geohash'])
+
+
+def downgrade():
+    with op.batch_alter_table('Venue') as batch_op:
+        batch_op.drop_index('ix_Venue_geohash')
+        batch_op.drop_column('geohash')
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
@@ -0,0 +1,28 @@
+"""index show start_time and id
+
+Revision ID: c1a76e3ec840
+Revises: dbee5f8a0cce
+Create Date: 2020-05-23 16:10:52.731840
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c1a76e3ec840'
+down_revision = 'dbee5f8a0cce'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # /shows seeks on (start_time, id) for keyset pagination, which needs
+    # both columns in the index to stay a range scan.
+    op.drop_index('ix_Show_start_time', table_name='Show')
+    op.create_index('ix_Show_start_time_id', 'Show', ['start_time', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Show_start_time_id', table_name='Show')
+    op.create_index('ix_Show_start_time', 'Show', ['start_time'], unique=False)
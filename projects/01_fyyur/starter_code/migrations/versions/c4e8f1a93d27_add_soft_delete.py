@@ -0,0 +1,34 @@
+"""add soft delete
+
+Revision ID: c4e8f1a93d27
+Revises: b7d2e5a8c6f1
+Create Date: 2020-07-04 09:52:17.160382
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8f1a93d27'
+down_revision = 'b7d2e5a8c6f1'
+branch_labels = None
+depends_on = None
+
+# Soft-deleted venues and artists are hidden until `flask purge-deleted`
+# removes them; the index lets the purge find them without a table scan.
+TABLES = ('Venue', 'Artist')
+
+
+def upgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+            batch_op.create_index('ix_{}_deleted_at'.format(table), ['deleted_at'])
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_index('ix_{}_deleted_at'.format(table))
+            batch_op.drop_column('deleted_at')
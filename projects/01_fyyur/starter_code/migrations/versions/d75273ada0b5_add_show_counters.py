@@ -0,0 +1,66 @@
+"""add show counters
+
+Revision ID: d75273ada0b5
+Revises: c1a76e3ec840
+Create Date: 2020-05-30 10:32:18.604417
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd75273ada0b5'
+down_revision = 'c1a76e3ec840'
+branch_labels = None
+depends_on = None
+
+COUNTED = [('Venue', 'Venue_id'), ('Artist', 'Artist_id')]
+
+show_table = sa.table(
+    'Show',
+    sa.column('id', sa.Integer),
+    sa.column('Venue_id', sa.Integer),
+    sa.column('Artist_id', sa.Integer),
+    sa.column('start_time', sa.DateTime),
+)
+
+
+def upgrade():
+    for table, key in COUNTED:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+            batch_op.add_column(sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('Counter_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rolled_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # Seed the counters from the existing shows.
+    now = datetime.now()
+    for table, key in COUNTED:
+        owner = sa.table(table, sa.column('id', sa.Integer),
+                         sa.column('upcoming_shows_count', sa.Integer),
+                         sa.column('past_shows_count', sa.Integer))
+
+        def count(*conditions):
+            return (sa.select([sa.func.count(show_table.c.id)])
+                    .where(sa.and_(show_table.c[key] == owner.c.id, *conditions))
+                    .as_scalar())
+
+        op.execute(owner.update().values(
+            upcoming_shows_count=count(show_table.c.start_time > now),
+            past_shows_count=count(show_table.c.start_time <= now)))
+    op.bulk_insert(sa.table('Counter_state', sa.column('id', sa.Integer), sa.column('rolled_at', sa.DateTime)),
+                   [{'id': 1, 'rolled_at': now}])
+
+
+def downgrade():
+    op.drop_table('Counter_state')
+    for table, key in COUNTED:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('past_shows_count')
+            batch_op.drop_column('upcoming_shows_count')
@@ -0,0 +1,53 @@
+"""add show primary key and indexes
+
+Revision ID: dbee5f8a0cce
+Revises: b395813175cd
+Create Date: 2020-05-16 11:47:35.907122
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'dbee5f8a0cce'
+down_revision = 'b395813175cd'
+branch_labels = None
+depends_on = None
+
+SHOW_INDEXES = [
+    ('ix_Show_Venue_id_start_time', ['Venue_id', 'start_time']),
+    ('ix_Show_Artist_id_start_time', ['Artist_id', 'start_time']),
+    ('ix_Show_start_time', ['start_time']),
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    # The Show table used to be created by db.create_all() rather than by a
+    # migration, so it may not exist yet.
+    if 'Show' not in sa.inspect(bind).get_table_names():
+        op.create_table('Show',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('Venue_id', sa.Integer(), nullable=True),
+        sa.Column('Artist_id', sa.Integer(), nullable=True),
+        sa.Column('start_time', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['Artist_id'], ['Artist.id'], ),
+        sa.ForeignKeyConstraint(['Venue_id'], ['Venue.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    elif bind.dialect.name == 'postgresql':
+        op.execute('ALTER TABLE "Show" ADD COLUMN id SERIAL PRIMARY KEY')
+    else:
+        with op.batch_alter_table('Show', recreate='always') as batch_op:
+            batch_op.add_column(sa.Column('id', sa.Integer(), primary_key=True))
+
+    for name, columns in SHOW_INDEXES:
+        op.create_index(name, 'Show', columns, unique=False)
+
+
+def downgrade():
+    for name, columns in SHOW_INDEXES:
+        op.drop_index(name, table_name='Show')
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.drop_column('id')
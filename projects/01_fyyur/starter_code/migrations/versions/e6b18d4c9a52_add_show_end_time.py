@@ -0,0 +1,71 @@
+"""add show end_time
+
+Revision ID: e6b18d4c9a52
+Revises: a4f0c2d7e913
+Create Date: 2020-06-13 15:47:09.318264
+
+"""
+from datetime import timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b18d4c9a52'
+down_revision = 'a4f0c2d7e913'
+branch_labels = None
+depends_on = None
+
+# Shows booked before durations existed are assumed to run two hours,
+# the form's default.
+DEFAULT_DURATION = timedelta(minutes=120)
+
+# No venue or artist can have two shows whose [start_time, end_time)
+# ranges overlap. btree_gist lets the integer ids share a GiST index with
+# the ranges; the same indexes serve the app's conflict check.
+EXCLUSION_CONSTRAINTS = [
+    ('ex_Show_Venue_id_overlap', 'Venue_id'),
+    ('ex_Show_Artist_id_overlap', 'Artist_id'),
+]
+
+show_table = sa.table(
+    'Show',
+    sa.column('id', sa.Integer),
+    sa.column('start_time', sa.DateTime),
+    sa.column('end_time', sa.DateTime),
+)
+
+
+def upgrade():
+    bind = op.get_bind()
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    if bind.dialect.name == 'postgresql':
+        op.execute(show_table.update().values(
+            end_time=show_table.c.start_time + sa.text("interval '120 minutes'")))
+    else:
+        rows = bind.execute(sa.select([show_table.c.id, show_table.c.start_time])).fetchall()
+        if rows:
+            bind.execute(show_table.update().where(show_table.c.id == sa.bindparam('show_id'))
+                         .values(end_time=sa.bindparam('show_end_time')),
+                         [{'show_id': show_id, 'show_end_time': start_time + DEFAULT_DURATION}
+                          for show_id, start_time in rows])
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.alter_column('end_time', existing_type=sa.DateTime(), nullable=False)
+
+    if bind.dialect.name != 'postgresql':
+        return
+    # Fails if the schedule already holds double bookings; those have to
+    # be resolved by hand first.
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    for name, key in EXCLUSION_CONSTRAINTS:
+        op.execute('ALTER TABLE "Show" ADD CONSTRAINT "{}" EXCLUDE USING gist '
+                   '("{}" WITH =, tsrange(start_time, end_time) WITH &&)'.format(name, key))
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for name, key in EXCLUSION_CONSTRAINTS:
+            op.drop_constraint(name, 'Show')
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.drop_column('end_time')
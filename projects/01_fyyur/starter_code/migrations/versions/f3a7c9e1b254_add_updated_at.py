@@ -0,0 +1,38 @@
+"""add updated_at
+
+Revision ID: f3a7c9e1b254
+Revises: e6b18d4c9a52
+Create Date: 2020-06-20 10:12:44.508113
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a7c9e1b254'
+down_revision = 'e6b18d4c9a52'
+branch_labels = None
+depends_on = None
+
+# The detail pages' ETag and Last-Modified are built from these (in UTC).
+# Existing rows count as changed at upgrade time, so clients refetch once.
+TABLES = ('Venue', 'Artist', 'Show')
+
+
+def upgrade():
+    now = datetime.utcnow()
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(sa.table(table, sa.column('updated_at', sa.DateTime()))
+                   .update().values(updated_at=now))
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('updated_at')
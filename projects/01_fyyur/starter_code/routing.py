@@ -0,0 +1,56 @@
+from flask import has_request_context, request
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import orm
+
+# ----------------------------------------------------------------------------#
+# Read-replica routing.
+#
+# When SQLALCHEMY_REPLICA_URI is set, the session sends the queries of GET
+# requests to the endpoints in SQLALCHEMY_READ_ENDPOINTS to the replica
+# (registered as the "replica" bind) and everything else, including any
+# flush, to the primary. Replicas lag the primary, so only views that can
+# show slightly stale data belong in the list.
+# ----------------------------------------------------------------------------#
+
+QUEUE_POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout')
+
+
+def reads_from_replica(app):
+	return (bool(app.config.get('SQLALCHEMY_REPLICA_URI'))
+			and has_request_context()
+			and request.method in ('GET', 'HEAD')
+			and request.endpoint in app.config.get('SQLALCHEMY_READ_ENDPOINTS', ()))
+
+
+class RoutingSession(SignallingSession):
+
+	def __init__(self, db, **options):
+		self.db = db
+		super(RoutingSession, self).__init__(db, **options)
+
+	def get_bind(self, mapper=None, clause=None):
+		if not self._flushing and reads_from_replica(self.app):
+			return self.db.get_engine(self.app, bind='replica')
+		return super(RoutingSession, self).get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+	def init_app(self, app):
+		replica = app.config.get('SQLALCHEMY_REPLICA_URI')
+		if replica:
+			binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+			binds['replica'] = replica
+			app.config['SQLALCHEMY_BINDS'] = binds
+		super(RoutingSQLAlchemy, self).init_app(app)
+
+	def create_engine(self, sa_url, engine_opts):
+		# SQLite URLs get a NullPool or StaticPool from apply_driver_hacks,
+		# and those don't take the queue pool settings.
+		if engine_opts.get('poolclass') is not None:
+			for option in QUEUE_POOL_OPTIONS:
+				engine_opts.pop(option, None)
+		return super(RoutingSQLAlchemy, self).create_engine(sa_url, engine_opts)
+
+	def create_session(self, options):
+		return orm.sessionmaker(class_=RoutingSession, db=self, **options)
@@ -0,0 +1,146 @@
+import bisect
+from collections import defaultdict
+
+# ----------------------------------------------------------------------------#
+# In-process n-gram index.
+#
+# PostgreSQL serves venue/artist search from pg_trgm GIN indexes (see the
+# trigram search migration). Databases without pg_trgm, such as the SQLite
+# file used in development, fall back to this index instead of scanning
+# every row with LIKE.
+# ----------------------------------------------------------------------------#
+
+NGRAM_SIZE = 3
+
+
+def normalize(text):
+	return ' '.join((text or '').lower().split())
+
+
+def ngrams(text, n=NGRAM_SIZE):
+	text = normalize(text)
+	return set(text[i:i + n] for i in range(len(text) - n + 1))
+
+
+def similarity(a, b):
+	# Jaccard similarity of the two n-gram sets, the same measure pg_trgm's
+	# similarity() uses, so both backends rank results alike.
+	if not a or not b:
+		return 0.0
+	return len(a & b) / float(len(a | b))
+
+
+class NgramIndex(object):
+
+	def __init__(self, fields, n=NGRAM_SIZE):
+		self.fields = fields
+		self.n = n
+		self.documents = {}
+		self.postings = defaultdict(set)
+
+	def add(self, doc_id, document):
+		self.remove(doc_id)
+		document = dict((key, normalize(value)) for key, value in document.items())
+		self.documents[doc_id] = document
+		for field in self.fields:
+			for gram in ngrams(document.get(field), self.n):
+				self.postings[gram].add(doc_id)
+
+	def remove(self, doc_id):
+		document = self.documents.pop(doc_id, None)
+		if document is None:
+			return
+		for field in self.fields:
+			for gram in ngrams(document.get(field), self.n):
+				self.postings[gram].discard(doc_id)
+
+	def candidates(self, term):
+		grams = ngrams(term, self.n)
+		if not grams:
+			# Terms shorter than one n-gram cannot be looked up in the index.
+			return set(self.documents)
+		postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+		return set.intersection(*postings)
+
+	def search(self, term, where=None):
+		'''
+		Returns (score, doc_id) pairs for documents with an indexed field
+		containing term, best match first. where optionally filters the
+		(normalized) documents.
+		'''
+		term = normalize(term)
+		term_grams = ngrams(term, self.n)
+		results = []
+		for doc_id in self.candidates(term):
+			document = self.documents[doc_id]
+			if where is not None and not where(document):
+				continue
+			matches = [field for field in self.fields if term in document.get(field, '')]
+			if not matches:
+				continue
+			score = max(similarity(term_grams, ngrams(document[field], self.n))
+						for field in matches)
+			results.append((score, doc_id))
+		# Ties are broken on the first indexed field, e.g. the name.
+		first_field = self.fields[0]
+		results.sort(key=lambda result: (-result[0], self.documents[result[1]].get(first_field, ''), result[1]))
+		return results
+
+
+# ----------------------------------------------------------------------------#
+# Prefix index.
+#
+# Serves name autocompletion. Every word position of a name is a key
+# ("the wild sax band", "wild sax band", "sax band", "band"), kept in one
+# sorted list, so a prefix lookup is a binary search plus a scan of the
+# matches, and adding or removing a name only touches its own keys.
+# ----------------------------------------------------------------------------#
+
+
+def name_keys(name):
+	words = normalize(name).split(' ')
+	return [' '.join(words[i:]) for i in range(len(words)) if words[i]]
+
+
+class PrefixIndex(object):
+
+	def __init__(self, names=()):
+		# names are (doc_id, name) pairs, sorted in one go.
+		self.names = dict(names)
+		self.keys = sorted((key, doc_id) for doc_id, name in self.names.items() for key in name_keys(name))
+
+	def add(self, doc_id, name):
+		self.remove(doc_id)
+		self.names[doc_id] = name
+		for key in name_keys(name):
+			bisect.insort(self.keys, (key, doc_id))
+
+	def remove(self, doc_id):
+		name = self.names.pop(doc_id, None)
+		if name is None:
+			return
+		for key in name_keys(name):
+			position = bisect.bisect_left(self.keys, (key, doc_id))
+			if position < len(self.keys) and self.keys[position] == (key, doc_id):
+				del self.keys[position]
+
+	def search(self, prefix, limit=10):
+		'''
+		Returns up to limit (doc_id, name) pairs with a word starting with
+		prefix, in the order of the matching keys.
+		'''
+		prefix = normalize(prefix)
+		if not prefix:
+			return []
+		results = []
+		seen = set()
+		for position in range(bisect.bisect_left(self.keys, (prefix,)), len(self.keys)):
+			key, doc_id = self.keys[position]
+			if not key.startswith(prefix):
+				break
+			if doc_id not in seen:
+				seen.add(doc_id)
+				results.append((doc_id, self.names[doc_id]))
+				if len(results) >= limit:
+					break
+		return results
@@ -14,4 +14,39 @@ for (let i = 0; i < deleteBtns.length; i++) {
 	   window.location.href ='/'
 	  })
 	}
-}
\ No newline at end of file
+}
+
+// Name lookups on the show form: suggestions come from /autocomplete, and
+// picking one fills in the ID field named by data-target.
+const lookups = document.querySelectorAll('[data-autocomplete]');
+for (let i = 0; i < lookups.length; i++) {
+	const input = lookups[i];
+	const options = document.getElementById(input.getAttribute('list'));
+	const target = document.getElementById(input.dataset['target']);
+	let ids = {};
+	let pending = null;
+	input.oninput = function() {
+	  if (ids[input.value] !== undefined) {
+		target.value = ids[input.value];
+		return;
+	  }
+	  clearTimeout(pending);
+	  pending = setTimeout(function() {
+		fetch('/autocomplete?type=' + input.dataset['autocomplete'] + '&q=' + encodeURIComponent(input.value))
+		.then(function(response) {
+		  return response.json();
+		})
+		.then(function(data) {
+		  ids = {};
+		  options.innerHTML = '';
+		  data.results.forEach(function(result) {
+			const label = result.name + ' (#' + result.id + ')';
+			ids[label] = result.id;
+			const option = document.createElement('option');
+			option.value = label;
+			options.appendChild(option);
+		  });
+		});
+	  }, 100);
+	};
+}
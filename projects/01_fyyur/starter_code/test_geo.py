@@ -0,0 +1,92 @@
+import math
+import random
+import unittest
+
+from app import create_app, db, nearest_venues, Venue
+from config import GAZETTEER_FILE
+from geo import (cell_ranges, covered_km, distance_km, geocode, geohash,
+                 geohash_cells)
+
+
+class GeoTestCase(unittest.TestCase):
+    """This class represents the geohash and geocoding test case"""
+
+    def test_geohash(self):
+        self.assertEqual(geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(geohash(37.7749, -122.4194, 5), '9q8yy')
+
+    def test_distance_km(self):
+        self.assertAlmostEqual(distance_km(37.7749, -122.4194, 40.7128, -74.0060), 4129, delta=5)
+        self.assertEqual(distance_km(10, 20, 10, 20), 0)
+
+    def test_cells_cover_points_within_covered_km(self):
+        rng = random.Random(19)
+        for _ in range(500):
+            lat, lon = rng.uniform(-80, 80), rng.uniform(-180, 180)
+            precision = rng.randint(2, 7)
+            reach = covered_km(lat, precision)
+            # A point at a random bearing, just inside the covered distance.
+            bearing = rng.uniform(0, 2 * math.pi)
+            step = reach * 0.99 / 6371.0088
+            other_lat = math.degrees(math.asin(
+                math.sin(math.radians(lat)) * math.cos(step)
+                + math.cos(math.radians(lat)) * math.sin(step) * math.cos(bearing)))
+            other_lon = lon + math.degrees(math.atan2(
+                math.sin(bearing) * math.sin(step) * math.cos(math.radians(lat)),
+                math.cos(step) - math.sin(math.radians(lat)) * math.sin(math.radians(other_lat))))
+            other_lon = (other_lon + 180) % 360 - 180
+            self.assertIn(geohash(other_lat, other_lon, precision), geohash_cells(lat, lon, precision))
+
+    def test_cell_ranges_merge_adjacent_cells(self):
+        self.assertEqual(cell_ranges(['9q8', '9q9', '9qb']), [('9q8', '9qc')])
+        self.assertEqual(cell_ranges(['9q8', '9qd']), [('9q8', '9q9'), ('9qd', '9qe')])
+        self.assertEqual(cell_ranges(['zzz']), [('zzz', None)])
+
+    def test_geocode(self):
+        self.assertEqual(geocode('San  Francisco', 'ca', GAZETTEER_FILE), (37.7749, -122.4194))
+        self.assertEqual(geocode('Saint Louis', 'MO', GAZETTEER_FILE), (38.6270, -90.1994))
+        self.assertIsNone(geocode('Nowhere', 'TX', GAZETTEER_FILE))
+        self.assertIsNone(geocode('', 'TX', GAZETTEER_FILE))
+
+
+class NearestVenuesTestCase(unittest.TestCase):
+    """This class represents the venue proximity search test case"""
+
+    def setUp(self):
+        """Define test variables and initialize app."""
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        rng = random.Random(7)
+        self.points = []
+        for venue_id in range(1, 301):
+            lat, lon = 37.0 + rng.uniform(-2, 2), -122.0 + rng.uniform(-2, 2)
+            self.points.append((venue_id, lat, lon))
+            db.session.add(Venue(id=venue_id, name='Venue {}'.format(venue_id), city='X', state='CA',
+                                 latitude=lat, longitude=lon,
+                                 geohash=geohash(lat, lon, 12)))
+        db.session.commit()
+
+    def tearDown(self):
+        """Executed after reach test"""
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def test_nearest_venues_match_brute_force(self):
+        rng = random.Random(8)
+        for _ in range(30):
+            lat, lon = 37.0 + rng.uniform(-2, 2), -122.0 + rng.uniform(-2, 2)
+            radius, limit = rng.choice([5, 25, 100]), rng.choice([1, 5, 20])
+            expected = sorted((distance_km(lat, lon, point_lat, point_lon), venue_id)
+                              for venue_id, point_lat, point_lon in self.points)
+            expected = [venue_id for distance, venue_id in expected if distance <= radius][:limit]
+            found = nearest_venues(lat, lon, radius, limit)
+
+            self.assertEqual([row.id for distance, row in found], expected)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import io
+import json
+import random
+import unittest
+
+from wtforms import Form, IntegerField, StringField
+from wtforms.validators import DataRequired
+
+from importer import detect_format, form_data, import_records, iter_json_array, read_records
+
+
+class RecordForm(Form):
+    name = StringField('name', validators=[DataRequired()])
+    seats = IntegerField('seats')
+
+
+class ImporterTestCase(unittest.TestCase):
+    """This class represents the bulk import pipeline test case"""
+
+    def test_iter_json_array_matches_json_loads(self):
+        rng = random.Random(10)
+        records = [{'name': 'Venue [{}], "quoted"'.format(i), 'genres': ['Jazz', 'Rock'] * (i % 3),
+                    'nested': {'seats': i, 'tags': []}, 'note': None}
+                   for i in range(200)]
+        for indent in (None, 2):
+            text = json.dumps(records, indent=indent)
+            for chunk_size in (1, 7, rng.randint(8, 4096)):
+                self.assertEqual(list(iter_json_array(io.StringIO(text), chunk_size)), records)
+
+    def test_iter_json_array_edge_cases(self):
+        self.assertEqual(list(iter_json_array(io.StringIO('  [ ]  '), 1)), [])
+        self.assertEqual(list(iter_json_array(io.StringIO('\n[1,\n2 , "3"]\n'), 2)), [1, 2, '3'])
+
+    def test_iter_json_array_errors(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('{"name": "not an array"}')))
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('[{"name": "a"}, {"name": '), 4))
+
+    def test_read_records(self):
+        csv_file = io.BytesIO('name,seats\nHall,100\nClub,\n'.encode('utf-8'))
+        jsonl_file = io.BytesIO(b'{"name": "Hall"}\n\n{"name": "Club"}\n')
+
+        self.assertEqual([dict(record) for record in read_records(csv_file, 'csv')],
+                         [{'name': 'Hall', 'seats': '100'}, {'name': 'Club', 'seats': ''}])
+        self.assertEqual(list(read_records(jsonl_file, 'jsonl')), [{'name': 'Hall'}, {'name': 'Club'}])
+
+    def test_detect_format(self):
+        self.assertEqual(detect_format('venues.CSV'), 'csv')
+        self.assertEqual(detect_format('shows.ndjson'), 'jsonl')
+        with self.assertRaises(ValueError):
+            detect_format('venues.xlsx')
+
+    def test_form_data(self):
+        data = form_data({'name': 'Hall', 'seats': 100, 'genres': 'Jazz, ,Rock', 'phone': None})
+
+        self.assertEqual(data.getlist('genres'), ['Jazz', 'Rock'])
+        self.assertEqual(data['seats'], '100')
+        self.assertNotIn('phone', data)
+
+    def test_import_records_batches_and_rejects(self):
+        batches = []
+
+        def insert_batch(batch):
+            batches.append([line for line, data in batch])
+            return [(line, 'duplicate') for line, data in batch if data['name'] == 'Dup']
+
+        records = [{'name': 'A'}, {'name': ''}, {'name': 'B', 'seats': 'many'},
+                   {'name': 'Dup'}, {'name': 'C'}]
+        results = list(import_records(records, RecordForm, insert_batch, batch_size=2))
+
+        self.assertEqual(batches, [[1, 4], [5]])
+        self.assertEqual(results[-1]['rows'], 5)
+        self.assertEqual(results[-1]['imported'], 2)
+        self.assertEqual(results[-1]['rejected'], 3)
+        self.assertEqual([error['line'] for error in results[-1]['errors']], [2, 3, 4])
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+
+from app import create_app, db, show_conflicts, Artist, Show, Venue
+from intervals import IntervalTree
+
+
+class IntervalTreeTestCase(unittest.TestCase):
+    """This class represents the interval tree test case"""
+
+    def test_overlapping_matches_brute_force(self):
+        rng = random.Random(12)
+        for _ in range(200):
+            intervals = []
+            for value in range(rng.randint(0, 40)):
+                start = rng.randint(0, 100)
+                intervals.append((start, start + rng.randint(0, 20), value))
+            tree = IntervalTree(intervals)
+            for _ in range(20):
+                start = rng.randint(-10, 110)
+                end = start + rng.randint(1, 30)
+                expected = sorted(value for low, high, value in intervals
+                                  if low < high and low < end and start < high)
+                self.assertEqual(sorted(tree.overlapping(start, end)), expected)
+
+    def test_touching_intervals_do_not_overlap(self):
+        tree = IntervalTree([(0, 10, 'a'), (20, 30, 'b')])
+
+        self.assertEqual(tree.overlapping(10, 20), [])
+        self.assertEqual(sorted(tree.overlapping(9, 21)), ['a', 'b'])
+
+    def test_empty_intervals_are_ignored(self):
+        tree = IntervalTree([(5, 5, 'empty'), (7, 3, 'backwards')])
+
+        self.assertEqual(tree.overlapping(0, 10), [])
+
+
+class ShowConflictsTestCase(unittest.TestCase):
+    """This class represents the show conflict detection test case"""
+
+    def setUp(self):
+        """Define test variables and initialize app."""
+        self.app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True})
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        db.session.add_all([Venue(id=1, name='Hall', city='Austin', state='TX'),
+                            Venue(id=2, name='Club', city='Austin', state='TX'),
+                            Artist(id=1, name='Band', city='Austin', state='TX'),
+                            Artist(id=2, name='Duo', city='Austin', state='TX')])
+        self.start = datetime(2031, 1, 1, 20)
+        db.session.execute(Show.insert().values(Venue_id=1, Artist_id=1, start_time=self.start,
+                                                end_time=self.start + timedelta(hours=2)))
+        db.session.commit()
+
+    def tearDown(self):
+        """Executed after reach test"""
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def show(self, venue_id, artist_id, hours, duration=2):
+        start_time = self.start + timedelta(hours=hours)
+        return (venue_id, artist_id, start_time, start_time + timedelta(hours=duration))
+
+    def test_booked_venue_or_artist_conflicts(self):
+        conflicts = show_conflicts([self.show(1, 2, 1), self.show(2, 1, -1), self.show(2, 2, 1)])
+
+        self.assertEqual([position for position, message in conflicts], [0, 1])
+        self.assertIn('venue 1', conflicts[0][1])
+        self.assertIn('artist 1', conflicts[1][1])
+
+    def test_back_to_back_shows_do_not_conflict(self):
+        self.assertEqual(show_conflicts([self.show(1, 1, 2), self.show(1, 1, -2)]), [])
+
+    def test_earlier_of_overlapping_new_shows_is_kept(self):
+        conflicts = show_conflicts([self.show(2, 2, 6), self.show(2, 2, 5)])
+
+        self.assertEqual([position for position, message in conflicts], [0])
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
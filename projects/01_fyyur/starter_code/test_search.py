@@ -0,0 +1,102 @@
+import random
+import unittest
+
+from search import NgramIndex, PrefixIndex, normalize
+
+
+def random_name(rng, words=('the', 'wild', 'sax', 'band', 'musical', 'hop', 'park', 'square', 'live', 'café')):
+    return ' '.join(rng.choice(words) for _ in range(rng.randint(1, 4)))
+
+
+class NgramIndexTestCase(unittest.TestCase):
+    """This class represents the in-process n-gram search index test case"""
+
+    def setUp(self):
+        """Define test variables and initialize the index."""
+        rng = random.Random(3)
+        self.documents = {}
+        self.index = NgramIndex(fields=('name', 'location'))
+        for doc_id in range(300):
+            document = {'name': random_name(rng).title(),
+                        'location': rng.choice(['San Francisco, CA', 'New York, NY', 'Austin, TX'])}
+            self.documents[doc_id] = document
+            self.index.add(doc_id, document)
+
+    def matching(self, term):
+        term = normalize(term)
+        return sorted(doc_id for doc_id, document in self.documents.items()
+                      if any(term in normalize(value) for value in document.values()))
+
+    def test_search_matches_substring_scan(self):
+        rng = random.Random(4)
+        terms = ['sax', 'SAX BAND', 'and', 'francisco', ', tx', 'ca', 'fé', 'zzz', 'k squ']
+        terms += [random_name(rng)[:rng.randint(1, 8)] for _ in range(50)]
+        for term in terms:
+            self.assertEqual(sorted(doc_id for score, doc_id in self.index.search(term)), self.matching(term))
+
+    def test_search_ranks_closer_matches_first(self):
+        index = NgramIndex(fields=('name',))
+        index.add(1, {'name': 'The Wild Sax Band and Friends'})
+        index.add(2, {'name': 'Wild Sax Band'})
+
+        self.assertEqual([doc_id for score, doc_id in index.search('sax band')], [2, 1])
+
+    def test_search_where(self):
+        found = self.index.search('the', where=lambda document: document['location'].endswith('tx'))
+
+        self.assertTrue(found)
+        self.assertTrue(all(self.documents[doc_id]['location'] == 'Austin, TX' for score, doc_id in found))
+
+    def test_add_replaces_and_remove_forgets(self):
+        self.index.add(0, {'name': 'Quasar Hall', 'location': 'Austin, TX'})
+        self.documents[0] = {'name': 'Quasar Hall', 'location': 'Austin, TX'}
+        self.index.remove(1)
+        del self.documents[1]
+
+        self.assertEqual([doc_id for score, doc_id in self.index.search('quasar')], [0])
+        for term in ('the', 'band', 'hop'):
+            self.assertEqual(sorted(doc_id for score, doc_id in self.index.search(term)), self.matching(term))
+
+
+class PrefixIndexTestCase(unittest.TestCase):
+    """This class represents the autocomplete prefix index test case"""
+
+    def setUp(self):
+        """Define test variables and initialize the index."""
+        rng = random.Random(16)
+        self.names = dict((doc_id, random_name(rng).title()) for doc_id in range(300))
+        self.index = PrefixIndex(self.names.items())
+
+    def matching(self, prefix):
+        prefix = normalize(prefix)
+        return sorted(doc_id for doc_id, name in self.names.items()
+                      if any(' '.join(normalize(name).split(' ')[i:]).startswith(prefix)
+                             for i in range(len(normalize(name).split(' ')))))
+
+    def test_search_matches_word_prefix_scan(self):
+        for prefix in ('s', 'SA', 'sax b', 'the wild', 'caf', 'live  park', 'zz', 'band hop'):
+            found = self.index.search(prefix, limit=len(self.names))
+
+            self.assertEqual(sorted(doc_id for doc_id, name in found), self.matching(prefix))
+            self.assertTrue(all(self.names[doc_id] == name for doc_id, name in found))
+
+    def test_search_limit_and_empty_prefix(self):
+        self.assertEqual(len(self.index.search('the', limit=3)), 3)
+        self.assertEqual(self.index.search('   '), [])
+
+    def test_add_replaces_and_remove_forgets(self):
+        self.index.add(0, 'Quasar Hall')
+        self.names[0] = 'Quasar Hall'
+        self.index.remove(1)
+        del self.names[1]
+        self.index.remove(12345)
+
+        self.assertEqual(self.index.search('hall'), [(0, 'Quasar Hall')])
+        for prefix in ('the', 'band', 'hop'):
+            found = self.index.search(prefix, limit=len(self.names))
+            self.assertEqual(sorted(doc_id for doc_id, name in found), self.matching(prefix))
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
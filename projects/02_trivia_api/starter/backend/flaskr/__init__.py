@@ -1,17 +1,36 @@
+import hashlib
+import json
 import os
+import time
 from flask import Flask, request, abort, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
+from sqlalchemy import func, literal_column
 import random
 
-from models import setup_db, Question, Category
+from models import setup_db, db, Question, Category, QUESTION_SEARCH_DOCUMENT
+from .quiz_sessions import QuizSessionStore
+from .search import InvertedIndex, tsquery
 
 QUESTIONS_PER_PAGE = 10
+# Seconds an app trusts its cached question totals and quiz pools. Its own
+# inserts and deletes refresh them at once; other workers' show up within
+# this time.
+QUESTION_COUNT_TTL = 60
+# Seconds a quiz session lives after its last turn, and how many sessions
+# an app keeps before dropping the least recently played.
+QUIZ_SESSION_TTL = 30 * 60
+QUIZ_SESSION_MAX = 10000
+# Seconds an app trusts its cached categories. Changes committed through
+# the app reload them at once; other workers' show up within this time.
+CATEGORY_CACHE_TTL = 10 * 60
 
 
 def create_app(test_config=None):
 	# create and configure the app
 	app = Flask(__name__)
+	if test_config:
+		app.config.from_mapping(test_config)
 	setup_db(app)
 
 	'''
@@ -28,16 +47,148 @@ def create_app(test_config=None):
 		response.headers.add('Access-Control-Allow-Methods', 'GET,PATCH,POST,DELETE,OPTIONS')
 		return response
 
-	def paginate_questions(request, selection):
+	category_catalog = {}
+
+	def categories_cached():
+		'''
+		The formatted categories, their types and an ETag of them, loaded
+		once and kept until Category.version changes or the TTL runs out.
+		'''
+		if (category_catalog.get('version') != Category.version
+				or time.time() - category_catalog['loaded'] > CATEGORY_CACHE_TTL):
+			version = Category.version
+			categories = [category.format() for category in Category.query.order_by(Category.id)]
+			types = [category['type'] for category in categories]
+			category_catalog.update(
+				version=version,
+				loaded=time.time(),
+				categories=categories,
+				types=types,
+				etag=hashlib.sha1(json.dumps(categories).encode()).hexdigest())
+		return category_catalog
+
+	def invalidate_categories():
+		Category.changed()
+
+	app.invalidate_categories = invalidate_categories
+
+	question_counts = {}
+
+	def count_questions(category=None):
+		'''
+		Total number of questions, overall or in one category, cached
+		instead of counted on every request.
+		'''
+		entry = question_counts.get(category)
+		if entry is None or time.time() - entry[0] > QUESTION_COUNT_TTL:
+			query = Question.query
+			if category is not None:
+				query = query.filter(Question.category == category)
+			entry = (time.time(), query.count())
+			question_counts[category] = entry
+		return entry[1]
+
+	quiz_sessions = app.config.get('QUIZ_SESSION_STORE') or QuizSessionStore(QUIZ_SESSION_TTL, QUIZ_SESSION_MAX)
+	question_pools = {}
+
+	def question_pool(category=None):
+		'''
+		Ids of the questions a quiz can ask, overall or in one category, and
+		the position of each id, cached like the totals so a quiz turn
+		never loads the question bank.
+		'''
+		entry = question_pools.get(category)
+		if entry is None or time.time() - entry[0] > QUESTION_COUNT_TTL:
+			query = Question.query.with_entities(Question.id)
+			if category is not None:
+				query = query.filter(Question.category == category)
+			ids = [row.id for row in query.order_by(Question.id)]
+			positions = dict((question_id, position) for position, question_id in enumerate(ids))
+			entry = (time.time(), ids, positions)
+			question_pools[category] = entry
+		return entry[1], entry[2]
+
+	def pick_question_id(ids, positions, previous_questions):
+		'''
+		A random id from ids that isn't one of previous_questions, or None.
+		Draws the k-th of the ids still left and finds its position by
+		stepping over the asked positions before it, so the work grows with
+		previous_questions, not with the pool.
+		'''
+		asked = sorted(set(positions[question_id] for question_id in previous_questions
+						   if question_id in positions))
+		if len(asked) == len(ids):
+			return None
+
+		position = random.randrange(len(ids) - len(asked))
+		for asked_position in asked:
+			if asked_position > position:
+				break
+			position += 1
+		return ids[position]
+
+	search_indexes = {}
+
+	def search_index():
+		'''
+		The in-process index used instead of PostgreSQL's full-text search,
+		rebuilt like the question totals.
+		'''
+		entry = search_indexes.get('questions')
+		if entry is None or time.time() - entry[0] > QUESTION_COUNT_TTL:
+			rows = Question.query.with_entities(Question.id, Question.question, Question.answer)
+			entry = (time.time(), InvertedIndex((row.id, '{} {}'.format(row.question, row.answer)) for row in rows))
+			search_indexes['questions'] = entry
+		return entry[1]
+
+	def search_questions(request, term):
+		'''
+		One page (?page=) of the questions matching term, best match first,
+		and how many match in all.
+		'''
 		page = request.args.get('page', 1, type=int)
+		if page < 1 or not tsquery(term):
+			return [], 0
+		offset = (page - 1) * QUESTIONS_PER_PAGE
+
+		if db.engine.dialect.name == 'postgresql':
+			document = literal_column(QUESTION_SEARCH_DOCUMENT)
+			query = func.to_tsquery('english', tsquery(term))
+			matches = Question.query.filter(document.op('@@')(query))
+			questions = (matches.order_by(func.ts_rank_cd(document, query).desc(), Question.id)
+						 .offset(offset).limit(QUESTIONS_PER_PAGE).all())
+			# A short first page holds every match, so it needs no count.
+			if page == 1 and len(questions) < QUESTIONS_PER_PAGE:
+				return questions, len(questions)
+			return questions, matches.count()
+
+		question_ids = search_index().search(term)
+		page_ids = question_ids[offset:offset + QUESTIONS_PER_PAGE]
+		questions = Question.query.filter(Question.id.in_(page_ids)).all() if page_ids else []
+		questions.sort(key=lambda question: page_ids.index(question.id))
+		return questions, len(question_ids)
+
+	def paginate_questions(request, query):
+		'''
+		Fetches one page of the query in SQL: the page after ?after_id= when
+		it is given (a keyset cursor, as cheap on the last page as on the
+		first), else ?page= with LIMIT/OFFSET. Returns the formatted
+		questions and the after_id of the next page, or None on the last.
+		'''
+		query = query.order_by(Question.id)
+		after_id = request.args.get('after_id', type=int)
+		if after_id is not None:
+			query = query.filter(Question.id > after_id)
+		else:
+			page = request.args.get('page', 1, type=int)
+			if page < 1:
+				return [], None
+			query = query.offset((page - 1) * QUESTIONS_PER_PAGE)
 
-		start = (page - 1) * QUESTIONS_PER_PAGE
-		end = start + QUESTIONS_PER_PAGE
-
-		questions = [question.format() for question in selection]
-		current_questions = questions[start:end]
-
-		return current_questions
+		# One extra row tells whether there is a next page.
+		rows = query.limit(QUESTIONS_PER_PAGE + 1).all()
+		next_after_id = rows[QUESTIONS_PER_PAGE - 1].id if len(rows) > QUESTIONS_PER_PAGE else None
+		return [question.format() for question in rows[:QUESTIONS_PER_PAGE]], next_after_id
 
 	'''
 	@TODO: 
@@ -47,20 +198,18 @@ def create_app(test_config=None):
 
 	@app.route('/categories', methods=['GET'])
 	def get_categories():
-		categories = Category.query.all()
+		catalog = categories_cached()
 
-		if not categories:
+		if not catalog['types']:
 			abort(404)
 
-		categories_all = [category.format() for category in categories]
-		categories_returned = []
-		for cat in categories_all:
-			categories_returned.append(cat['type'])
-
-		return jsonify({
+		response = jsonify({
 			'success': True,
-			'categories': categories_returned
+			'categories': catalog['types']
 		})
+		response.set_etag(catalog['etag'])
+		response.cache_control.no_cache = True
+		return response.make_conditional(request)
 
 	'''
 	@TODO: 
@@ -77,21 +226,16 @@ def create_app(test_config=None):
 
 	@app.route('/questions', methods=['GET'])
 	def get_questions():
-		selection = Question.query.order_by(Question.id).all()
-		questions_paginated = paginate_questions(request, selection)
+		questions_paginated, next_after_id = paginate_questions(request, Question.query)
 		if len(questions_paginated) == 0:
 			abort(404)
 
-		categories = Category.query.all()
-		categories_all = [category.format() for category in categories]
-
-		categories_returned = []
-		for cat in categories_all:
-			categories_returned.append(cat['type'])
+		categories_returned = categories_cached()['types']
 		return jsonify({
 			'success': True,
 			'questions': questions_paginated,
-			'total_questions': len(selection),
+			'next_after_id': next_after_id,
+			'total_questions': count_questions(),
 			'categories': categories_returned,
 			'current_category': categories_returned  # ???
 		})
@@ -111,6 +255,9 @@ def create_app(test_config=None):
 			abort(400)
 		try:
 			question.delete()
+			question_counts.clear()
+			question_pools.clear()
+			search_indexes.clear()
 			return jsonify({
 				'success': True,
 				'deleted': question_id
@@ -150,21 +297,18 @@ def create_app(test_config=None):
 		search_term = body.get('searchTerm', None)
 
 		if search_term:
-			questions = Question.query.filter(Question.question.contains(search_term)).all()
+			questions, total_matches = search_questions(request, search_term)
 
 			if not questions:
 				abort(404)
 
 			questions_found = [question.format() for question in questions]
-			selections = Question.query.order_by(Question.id).all()
-			categories = Category.query.all()
-			categories_all = [category.format() for category in categories]
 
 			return jsonify({
 				'success': True,
 				'questions': questions_found,
-				'total_questions': len(selections),
-				'current_category': categories_all
+				'total_questions': total_matches,
+				'current_category': categories_cached()['categories']
 			})
 
 		new_question = body.get('question', None)
@@ -192,13 +336,16 @@ def create_app(test_config=None):
 				difficulty=new_difficulty
 			)
 			question.insert()
-			selections = Question.query.order_by(Question.id).all()
-			questions_paginated = paginate_questions(request, selections)
+			question_counts.clear()
+			question_pools.clear()
+			search_indexes.clear()
+			questions_paginated, next_after_id = paginate_questions(request, Question.query)
 			return jsonify({
 				'success': True,
 				'created': question.id,
 				'questions': questions_paginated,
-				'total_questions': len(selections)
+				'next_after_id': next_after_id,
+				'total_questions': count_questions()
 			})
 
 		except:
@@ -215,15 +362,14 @@ def create_app(test_config=None):
 
 	@app.route('/categories/<string:category_id>/questions', methods=['GET'])
 	def get_questions_from_categories(category_id):
-		selection = (Question.query
-					 .filter(Question.category == str(int(category_id) + 1))
-					 .order_by(Question.id)
-					 .all())
+		category = str(int(category_id) + 1)
+		total_questions = count_questions(category)
 
-		if not selection:
+		if not total_questions:
 			abort(400)
 
-		questions_paginated = paginate_questions(request, selection)
+		questions_paginated, next_after_id = paginate_questions(
+			request, Question.query.filter(Question.category == category))
 
 		if not questions_paginated:
 			abort(404)
@@ -231,7 +377,8 @@ def create_app(test_config=None):
 		return jsonify({
 			'success': True,
 			'questions': questions_paginated,
-			'total_questions': len(selection),
+			'next_after_id': next_after_id,
+			'total_questions': total_questions,
 			'current_category': category_id
 		})
 
@@ -254,28 +401,76 @@ def create_app(test_config=None):
 		if not body:
 			abort(400)
 
-		previous_questions = body.get('previous_questions', None)
+		previous_questions = body.get('previous_questions', None) or []
 		current_category = body.get('quiz_category', None)
-		if not previous_questions:
-			if current_category:
-				questions_raw = (Question.query.filter(Question.category == str(int(current_category['id']) + 1)).all())
-			else:
-				questions_raw = (Question.query.all())
+		category = str(int(current_category['id']) + 1) if current_category else None
+
+		for _ in range(2):
+			ids, positions = question_pool(category)
+			question_id = pick_question_id(ids, positions, previous_questions)
+			if question_id is None:
+				abort(404)
+			question = Question.query.get(question_id)
+			if question:
+				break
+			# Deleted through another worker since the pool was cached.
+			question_pools.pop(category, None)
 		else:
-			if current_category:
-				questions_raw = (
-					Question.query.filter(Question.category == str(int(current_category['id']) + 1)).filter(
-						Question.id.notin_(previous_questions)).all())
-			else:
-				questions_raw = (Question.query.filter(Question.id.notin_(previous_questions)).all())
-
-		questions_formatted = [question.format() for question in questions_raw]
-		if (len(questions_formatted) == 0):
 			abort(404)
-		random_question = questions_formatted[random.randint(0, len(questions_formatted)-1)]
+
+		return jsonify({
+			'success': True,
+			'question': question.format()
+		})
+
+	@app.route('/quizzes/sessions', methods=['POST'])
+	def start_quiz_session():
+		'''
+		Shuffles the category's questions into a deck once; each turn of
+		the session then takes the next one without resending the
+		questions already asked.
+		'''
+		body = request.get_json(silent=True) or {}
+		current_category = body.get('quiz_category', None)
+		category = str(int(current_category['id']) + 1) if current_category else None
+
+		deck = list(question_pool(category)[0])
+		if not deck:
+			abort(404)
+		random.shuffle(deck)
+
+		return jsonify({
+			'success': True,
+			'session_id': quiz_sessions.create(deck),
+			'total_questions': len(deck)
+		})
+
+	@app.route('/quizzes/sessions/<string:session_id>/next', methods=['POST'])
+	def next_quiz_question(session_id):
+		while True:
+			turn = quiz_sessions.pop(session_id)
+			if turn is None:
+				abort(404)
+			question_id, remaining = turn
+			question = Question.query.get(question_id)
+			# Questions deleted since the deck was dealt are skipped.
+			if question:
+				break
+
+		return jsonify({
+			'success': True,
+			'question': question.format(),
+			'remaining_questions': remaining
+		})
+
+	@app.route('/quizzes/sessions/<string:session_id>', methods=['DELETE'])
+	def end_quiz_session(session_id):
+		if not quiz_sessions.delete(session_id):
+			abort(404)
+
 		return jsonify({
 			'success': True,
-			'question': random_question
+			'deleted': session_id
 		})
 
 	'''
@@ -0,0 +1,61 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+'''
+QuizSessionStore
+	keeps each quiz session's shuffled deck of question ids. Any object
+	with the same create / pop / delete methods can replace it, e.g. one
+	backed by a Redis list (RPUSH and EXPIRE to create, RPOP to pop) when
+	several workers must share sessions.
+'''
+class QuizSessionStore:
+
+	def __init__(self, ttl, max_sessions):
+		self.ttl = ttl
+		self.max_sessions = max_sessions
+		self.sessions = OrderedDict()
+		self.lock = threading.Lock()
+
+	def create(self, deck):
+		'''
+		Stores a deck and returns the new session's id. The deck is popped
+		from its end.
+		'''
+		session_id = secrets.token_urlsafe(16)
+		with self.lock:
+			self.evict(time.time())
+			while len(self.sessions) >= self.max_sessions:
+				self.sessions.popitem(last=False)
+			self.sessions[session_id] = (time.time() + self.ttl, list(deck))
+		return session_id
+
+	def pop(self, session_id):
+		'''
+		The next question id of the session and how many are left after
+		it; None for an unknown or expired session, or an empty deck.
+		Each pop keeps the session alive for another ttl seconds.
+		'''
+		with self.lock:
+			now = time.time()
+			self.evict(now)
+			entry = self.sessions.get(session_id)
+			if entry is None or not entry[1]:
+				return None
+			deck = entry[1]
+			self.sessions[session_id] = (now + self.ttl, deck)
+			self.sessions.move_to_end(session_id)
+			return deck.pop(), len(deck)
+
+	def delete(self, session_id):
+		with self.lock:
+			return self.sessions.pop(session_id, None) is not None
+
+	def evict(self, now):
+		# Sessions are kept in order of expiry, so expired ones are in front.
+		while self.sessions:
+			session_id, (expires, _) = next(iter(self.sessions.items()))
+			if expires > now:
+				break
+			del self.sessions[session_id]
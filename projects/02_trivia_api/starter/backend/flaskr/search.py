@@ -0,0 +1,55 @@
+import bisect
+import re
+from collections import defaultdict
+
+'''
+Full-text question search
+    PostgreSQL matches questions against the GIN index over their words
+    (QUESTION_SEARCH_DOCUMENT in models.py). Other databases, such as SQLite
+    in development, search an in-process inverted index of the same words.
+    Both match every word of the search term as a prefix of a word in the
+    question or answer, and rank questions with more matches first.
+'''
+
+
+def words(text):
+	return re.findall(r'\w+', (text or '').lower())
+
+
+def tsquery(term):
+	# Only \w+ words reach to_tsquery, so a search term can't inject query syntax.
+	return ' & '.join(word + ':*' for word in words(term))
+
+
+class InvertedIndex:
+
+	def __init__(self, documents):
+		# documents are (doc_id, text) pairs.
+		self.postings = defaultdict(dict)
+		for doc_id, text in documents:
+			for word in words(text):
+				postings = self.postings[word]
+				postings[doc_id] = postings.get(doc_id, 0) + 1
+		self.words = sorted(self.postings)
+
+	def search(self, term):
+		'''
+		Ids of the documents with a word starting with each word of term,
+		the most occurrences first.
+		'''
+		scores = None
+		for prefix in set(words(term)):
+			matches = defaultdict(int)
+			for position in range(bisect.bisect_left(self.words, prefix), len(self.words)):
+				word = self.words[position]
+				if not word.startswith(prefix):
+					break
+				for doc_id, count in self.postings[word].items():
+					matches[doc_id] += count
+			if scores is None:
+				scores = matches
+			else:
+				scores = dict((doc_id, scores[doc_id] + count) for doc_id, count in matches.items() if doc_id in scores)
+			if not scores:
+				return []
+		return sorted(scores or (), key=lambda doc_id: (-scores[doc_id], doc_id))
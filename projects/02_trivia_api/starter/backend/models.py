@@ -1,5 +1,6 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+from sqlalchemy import DDL, Column, String, Integer, Index, create_engine, event
+from sqlalchemy.orm import Session, object_session
 from flask_sqlalchemy import SQLAlchemy
 import json
 
@@ -25,6 +26,8 @@ Question
 '''
 class Question(db.Model):  
   __tablename__ = 'questions'
+  # Category pages filter on category and page through id.
+  __table_args__ = (Index('ix_questions_category_id', 'category', 'id'),)
 
   id = Column(Integer, primary_key=True)
   question = Column(String)
@@ -58,12 +61,22 @@ class Question(db.Model):
       'difficulty': self.difficulty
     }
 
+# The words of a question and its answer, for full-text search. Queries
+# must use this exact expression for PostgreSQL to use the GIN index on it.
+QUESTION_SEARCH_DOCUMENT = "to_tsvector('english', coalesce(question, '') || ' ' || coalesce(answer, ''))"
+
+event.listen(Question.__table__, 'after_create', DDL(
+  'CREATE INDEX ix_questions_search ON questions USING gin (%s)' % QUESTION_SEARCH_DOCUMENT
+).execute_if(dialect='postgresql'))
+
 '''
 Category
-
+    version goes up with every committed change to the categories, so
+    caches of them know when to reload
 '''
 class Category(db.Model):  
   __tablename__ = 'categories'
+  version = 0
 
   id = Column(Integer, primary_key=True)
   type = Column(String)
@@ -75,4 +88,23 @@ class Category(db.Model):
     return {
       'id': self.id,
       'type': self.type
-    }
\ No newline at end of file
+    }
+
+  @classmethod
+  def changed(cls):
+    cls.version += 1
+
+def category_written(mapper, connection, target):
+  object_session(target).info['categories_changed'] = True
+
+for event_name in ('after_insert', 'after_update', 'after_delete'):
+  event.listen(Category, event_name, category_written)
+
+@event.listens_for(Session, 'after_commit')
+def commit_category_changes(session):
+  if session.info.pop('categories_changed', False):
+    Category.changed()
+
+@event.listens_for(Session, 'after_rollback')
+def discard_category_changes(session):
+  session.info.pop('categories_changed', None)
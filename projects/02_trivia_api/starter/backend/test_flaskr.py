@@ -103,6 +103,22 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(len(data['questions']) > 0)
         self.assertTrue(data['total_questions'] > 0)
 
+    def test_search_question_ignores_case(self):
+        res = self.client().post('/questions', json={'searchTerm': 'TOM HANKS'})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(data['success'])
+        self.assertEqual(data['total_questions'], len(data['questions']))
+        self.assertIn('Tom Hanks', data['questions'][0]['question'])
+
+    def test_error_404_search_question_past_last_page(self):
+        res = self.client().post('/questions?page=1000', json={'searchTerm': 'movie'})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['success'], False)
+
     def test_error_404_search_question(self):
         """Test POST to search a question with non existing search term. """
 
@@ -127,6 +143,15 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(data['success'])
         self.assertTrue(len(data['categories']) > 0)
 
+    def test_get_all_categories_not_modified(self):
+        res = self.client().get('/categories')
+        etag = res.headers['ETag']
+
+        res = self.client().get('/categories', headers={'If-None-Match': etag})
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.headers['ETag'], etag)
+
     def test_error_405_get_all_categories(self):
         res = self.client().patch('/categories')
         data = json.loads(res.data)
@@ -159,6 +184,30 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['error'], 404)
         self.assertEqual(data['success'], False)
 
+    def test_get_questions_after_id(self):
+        """Test that the after_id cursor returns the same page as ?page=2 """
+        first_page = json.loads(self.client().get('/questions?page=1').data)
+        second_page = json.loads(self.client().get('/questions?page=2').data)
+
+        res = self.client().get('/questions?after_id={}'.format(first_page['next_after_id']))
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(data['success'])
+        self.assertEqual(len(first_page['questions']), 10)
+        self.assertEqual(first_page['next_after_id'], first_page['questions'][-1]['id'])
+        self.assertEqual([q['id'] for q in data['questions']],
+                         [q['id'] for q in second_page['questions']])
+        self.assertEqual(data['total_questions'], first_page['total_questions'])
+
+    def test_error_404_get_questions_after_last_id(self):
+        res = self.client().get('/questions?after_id=12452512')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['error'], 404)
+        self.assertEqual(data['success'], False)
+
 
     def test_delete_question(self):
         json_create_question = {
@@ -213,6 +262,69 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(data['question']['question'])
         self.assertTrue(data['question']['id'] not in json_play_quizz['previous_questions'])
 
+    def test_play_quiz_last_question_in_category(self):
+        with self.app.app_context():
+            question_ids = [question.id for question in Question.query.filter(Question.category == '2').all()]
+        json_play_quizz = {
+            'previous_questions': question_ids[1:],
+            'quiz_category': {
+                'type': 'Art',
+                'id': '1'
+            }
+        }
+        res = self.client().post('/quizzes', json=json_play_quizz)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(data['success'])
+        self.assertEqual(data['question']['id'], question_ids[0])
+
+    def test_error_404_play_quiz_no_questions_left(self):
+        with self.app.app_context():
+            question_ids = [question.id for question in Question.query.filter(Question.category == '2').all()]
+        json_play_quizz = {
+            'previous_questions': question_ids,
+            'quiz_category': {
+                'type': 'Art',
+                'id': '1'
+            }
+        }
+        res = self.client().post('/quizzes', json=json_play_quizz)
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['error'], 404)
+        self.assertEqual(data['success'], False)
+
+    def test_play_quiz_session(self):
+        res = self.client().post('/quizzes/sessions', json={'quiz_category': {'type': 'Art', 'id': '1'}})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(data['success'])
+        self.assertTrue(data['session_id'])
+
+        question_ids = []
+        for remaining in reversed(range(data['total_questions'])):
+            res = self.client().post('/quizzes/sessions/{}/next'.format(data['session_id']))
+            turn = json.loads(res.data)
+
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(turn['remaining_questions'], remaining)
+            question_ids.append(turn['question']['id'])
+
+        self.assertEqual(len(set(question_ids)), data['total_questions'])
+        res = self.client().post('/quizzes/sessions/{}/next'.format(data['session_id']))
+        self.assertEqual(res.status_code, 404)
+
+    def test_error_404_play_quiz_session(self):
+        res = self.client().post('/quizzes/sessions/{}/next'.format('unknown'))
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['error'], 404)
+        self.assertEqual(data['success'], False)
+
     def test_error_400_play_quiz(self):
         res = self.client().post('/quizzes')
         data = json.loads(res.data)